@@ -1,27 +1,526 @@
+import argparse
+import ast
+import importlib
+import json
+import math
+import os
+import random
+import signal
+import statistics
 import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+# Interpreter of 'subprocess' mode: the grader's own, which 'fork' mode runs programs under, so that both modes see
+# the same Python version and site-packages and their verdicts and timings can be compared
+PYTHON = sys.executable or '/usr/bin/python3'
+DEFAULT_TIMEOUT = 10.0  # seconds of wall-clock time per test case
+DEFAULT_THRESHOLD = 0.10  # relative slow-down (or memory growth) against the baseline reported as a regression
+DEFAULT_MIN_DELTA = 0.005  # seconds; smaller absolute slow-downs are timing noise, not regressions
+DEFAULT_BUDGET = 2.0  # seconds per generated input before the complexity sweep stops
+
+COMPLEXITY_CLASSES = ['O(n)', 'O(n^2)', 'O(n^3)', 'exponential']
+MIN_MEASURABLE = 0.02  # seconds above start-up time a run needs before it is used in the fit
+EXPONENTIAL_N = 64  # a polynomial solution up to O(n^3) never runs out of budget this early
+FIT_POINTS = 3  # the slope is fitted on the largest sizes only, where lower-order terms matter least
+
+MODES = ['fork', 'subprocess']
+
+# Verdicts
+PASSED = 'PASSED'
+WRONG_ANSWER = 'WA'
+TIME_LIMIT_EXCEEDED = 'TLE'
+RUNTIME_ERROR = 'RE'
+
+
+def find_test_cases(testcase_dir='testcases'):
+    # (input_file, output_file) of every inputN.txt that has a matching outputN.txt, ordered by N
+    cases = []
+    i = 0
+    while os.path.exists(os.path.join(testcase_dir, f'input{i}.txt')):
+        output_file = os.path.join(testcase_dir, f'output{i}.txt')
+        if os.path.exists(output_file):
+            cases.append((os.path.join(testcase_dir, f'input{i}.txt'), output_file))
+        i += 1
+    return cases
+
+
+def _output_files():
+    # Output goes to temporary files rather than pipes, so nothing has to be read while several cases run at once
+    return tempfile.TemporaryFile(), tempfile.TemporaryFile()
+
+
+def default_mode():
+    return 'fork' if hasattr(os, 'fork') else 'subprocess'
+
+
+def _start_subprocess(program_file, input_file):
+    # Run the program as a subprocess with the test input on stdin
+    stdout, stderr = _output_files()
+    with open(input_file, 'r') as stdin:
+        process = subprocess.Popen([PYTHON, program_file], stdin=stdin, stdout=stdout, stderr=stderr)
+    return {'pid': process.pid, 'process': process, 'stdout': stdout, 'stderr': stderr}
+
+
+def _module_level_imports(statements):
+    # import statements that run when the module runs: at top level and in module-level try/if/with blocks, not in
+    # function or class bodies
+    for node in statements:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            yield node
+        elif isinstance(node, ast.Try) or type(node).__name__ == 'TryStar':
+            for block in [node.body] + [handler.body for handler in node.handlers] + [node.orelse, node.finalbody]:
+                yield from _module_level_imports(block)
+        elif isinstance(node, ast.If):
+            yield from _module_level_imports(node.body)
+            yield from _module_level_imports(node.orelse)
+        elif isinstance(node, ast.With):
+            yield from _module_level_imports(node.body)
+
+
+def warm_up(program_file):
+    """ Compile the program and import every module it imports at module level into this process, so that forked
+    children start with them already loaded. That includes imports inside module-level try/if blocks (optional
+    dependencies), and for `from X import Y` the submodule X.Y when Y is one. The program itself is not executed here:
+    its top level may read the test input, and it has to run with __name__ == "__main__" in the child anyway.
+
+    :return: code object of the program
+    """
+    with open(program_file, 'r') as f:
+        source = f.read()
+    tree = ast.parse(source, program_file)
+    code = compile(tree, program_file, 'exec')
+    program_dir = os.path.dirname(os.path.abspath(program_file))
+    sys.path.insert(0, program_dir)
+    try:
+        for node in _module_level_imports(tree.body):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+                names = [node.module] + [f'{node.module}.{alias.name}' for alias in node.names if alias.name != '*']
+            for name in names:
+                try:
+                    importlib.import_module(name)
+                except Exception:
+                    # leave it to the child, which reports the error as a runtime error of the program; for
+                    # `from X import Y` with Y not a submodule this is expected
+                    pass
+    finally:
+        sys.path.remove(program_dir)
+    return code
+
+
+def _run_forked_child(code, program_file, input_file, stdout, stderr):
+    # Runs in the forked child and never returns: redirect stdin/stdout/stderr, patch sys.argv and sys.path like
+    # `python3 program_file` would, execute the program as __main__ and exit with its status.
+    status = 1
+    try:
+        input_fd = os.open(input_file, os.O_RDONLY)
+        os.dup2(input_fd, 0)
+        os.close(input_fd)
+        os.dup2(stdout.fileno(), 1)
+        os.dup2(stderr.fileno(), 2)
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', closefd=False)
+        sys.stderr = open(2, 'w', closefd=False)
+        sys.argv = [program_file]
+        sys.path[0] = os.path.dirname(os.path.abspath(program_file))
+        try:
+            exec(code, {'__name__': '__main__', '__file__': program_file, '__builtins__': __builtins__})
+            status = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except BaseException:
+            traceback.print_exc()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(status)
+
+
+def _start_forked(code, program_file, input_file):
+    stdout, stderr = _output_files()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _run_forked_child(code, program_file, input_file, stdout, stderr)
+    return {'pid': pid, 'process': None, 'stdout': stdout, 'stderr': stderr}
+
+
+def _finish(task, status, rusage):
+    returncode = os.waitstatus_to_exitcode(status)
+    if task['process'] is not None:
+        task['process'].returncode = returncode
+    stdout, stderr = task['stdout'], task['stderr']
+    stdout.seek(0)
+    actual_output = stdout.read().decode(errors='replace').strip()
+    stderr.seek(0)
+    error_output = stderr.read().decode(errors='replace')
+    stdout.close()
+    stderr.close()
+    with open(task['output_file'], 'r') as f:
+        expected_output = f.read().strip()
+
+    if task['timed_out']:
+        verdict = TIME_LIMIT_EXCEEDED
+    elif returncode != 0:
+        verdict = RUNTIME_ERROR
+    elif actual_output == expected_output:
+        verdict = PASSED
+    else:
+        verdict = WRONG_ANSWER
+    return {
+        'program': task['program_file'],
+        'input': task['input_file'],
+        'verdict': verdict,
+        'elapsed': time.perf_counter() - task['start'],
+        'peak_rss_kb': rusage.ru_maxrss,
+        'returncode': returncode,
+        'stderr': error_output,
+    }
+
+
+def run_test_cases(jobs, workers=None, timeout=DEFAULT_TIMEOUT, mode=None):
+    """ Run test cases concurrently, at most `workers` at a time.
+
+    Every case gets `timeout` seconds of wall-clock time before it is killed. Children are reaped with os.wait4, which
+    gives the peak resident set size of each case on its own.
+
+    In 'fork' mode every program is compiled and its imports loaded once in this process (see warm_up), and each case
+    runs in a forked child instead of a fresh interpreter, which saves the interpreter start-up on every case. The
+    child inherits the grader's memory, so its peak RSS includes the grader's. 'subprocess' mode starts a new PYTHON,
+    the grader's own interpreter as well, per case and is used when fork is not available or the program does not
+    compile.
+
+    :param jobs: list of (program_file, input_file, output_file)
+    :param workers: number of cases running at once, defaults to the number of cores
+    :param timeout: seconds per case, None for no limit
+    :param mode: 'fork' or 'subprocess', defaults to 'fork' where os.fork exists
+    :return: list of result dicts (program, input, verdict, elapsed, peak_rss_kb, returncode, stderr) in job order
+    """
+    workers = workers or os.cpu_count() or 1
+    if mode is None:
+        mode = default_mode()
+    if mode not in MODES:
+        raise ValueError(f'unknown mode {mode!r}, expected one of {MODES}')
+    codes = {}
+    if mode == 'fork':
+        for program_file in dict.fromkeys(job[0] for job in jobs):
+            try:
+                codes[program_file] = warm_up(program_file)
+            except (OSError, SyntaxError, ValueError):
+                pass
+    results = [None] * len(jobs)
+    pending = list(enumerate(jobs))
+    pending.reverse()
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            index, (program_file, input_file, output_file) = pending.pop()
+            if program_file in codes:
+                task = _start_forked(codes[program_file], program_file, input_file)
+            else:
+                task = _start_subprocess(program_file, input_file)
+            task.update({
+                'index': index, 'program_file': program_file, 'input_file': input_file, 'output_file': output_file,
+                'start': time.perf_counter(), 'timed_out': False,
+            })
+            running[task['pid']] = task
+        reaped = False
+        for pid in list(running):
+            task = running[pid]
+            finished_pid, status, rusage = os.wait4(pid, os.WNOHANG)
+            if finished_pid:
+                del running[pid]
+                results[task['index']] = _finish(task, status, rusage)
+                reaped = True
+            elif timeout is not None and not task['timed_out'] and time.perf_counter() - task['start'] > timeout:
+                task['timed_out'] = True
+                os.kill(pid, signal.SIGKILL)
+        if not reaped:
+            time.sleep(0.002)
+    return results
+
+
+def run_test_case(input_file, output_file, program_file, timeout=DEFAULT_TIMEOUT, mode=None):
+    return run_test_cases([(program_file, input_file, output_file)], 1, timeout, mode)[0]['verdict'] == PASSED
+
+
+def percentile(values, p):
+    # nearest-rank percentile, p in (0, 100]
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(results):
+    """ Aggregate repeated runs of the same cases.
+
+    :param results: list of result dicts from run_test_cases, possibly several per (program, input)
+    :return: report dict {program: {case name: {verdict, runs, median, p95, min, max, peak_rss_kb}}}; the verdict is
+             the first one that is not PASSED, so a flaky case does not hide
+    """
+    grouped = {}
+    for result in results:
+        case = os.path.basename(result['input'])
+        grouped.setdefault(result['program'], {}).setdefault(case, []).append(result)
+    report = {}
+    for program, cases in grouped.items():
+        report[program] = {}
+        for case, runs in cases.items():
+            elapsed = [run['elapsed'] for run in runs]
+            failures = [run['verdict'] for run in runs if run['verdict'] != PASSED]
+            report[program][case] = {
+                'verdict': failures[0] if failures else PASSED,
+                'runs': len(runs),
+                'median': statistics.median(elapsed),
+                'p95': percentile(elapsed, 95),
+                'min': min(elapsed),
+                'max': max(elapsed),
+                'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+            }
+    return report
+
+
+def write_report(report, path, repeat=1, mode=None):
+    # mode: the mode the cases ran in, default_mode() if None
+    with open(path, 'w') as f:
+        json.dump({'repeat': repeat, 'mode': mode or default_mode(), 'programs': report}, f, indent=2)
+
+
+def load_report(path):
+    # (report, mode it was taken in or None for reports that do not record it)
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data['programs'], data.get('mode')
+
+
+def find_regressions(report, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA, mode=None,
+                     baseline_mode=None):
+    """ Compare a report from summarize against a baseline report.
+
+    A case regresses when its median or p95 time grew by more than `threshold` (relative) and `min_delta` seconds, its
+    peak RSS grew by more than `threshold`, or it passed in the baseline and does not anymore. Cases missing from the
+    baseline are skipped.
+
+    Reports taken in different modes are not compared: start-up time differs, and peak RSS in 'fork' mode includes
+    the grader's memory.
+
+    :param mode: mode the report was taken in, None if unknown
+    :param baseline_mode: mode the baseline was taken in, None if unknown
+    :return: list of (program, case, metric, baseline value, new value)
+    :raises ValueError: if both modes are known and differ
+    """
+    if mode is not None and baseline_mode is not None and mode != baseline_mode:
+        raise ValueError(f'the baseline was taken in {baseline_mode} mode and this run in {mode} mode; rerun with '
+                         f'--mode {baseline_mode} to compare them')
+    regressions = []
+    for program, cases in report.items():
+        for case, stats in cases.items():
+            old = baseline.get(program, {}).get(case)
+            if old is None:
+                continue
+            if old['verdict'] == PASSED and stats['verdict'] != PASSED:
+                regressions.append((program, case, 'verdict', old['verdict'], stats['verdict']))
+            for metric in ('median', 'p95'):
+                if stats[metric] > old[metric] * (1 + threshold) and stats[metric] - old[metric] > min_delta:
+                    regressions.append((program, case, metric, old[metric], stats[metric]))
+            if stats['peak_rss_kb'] > old['peak_rss_kb'] * (1 + threshold):
+                regressions.append((program, case, 'peak_rss_kb', old['peak_rss_kb'], stats['peak_rss_kb']))
+    return regressions
+
+
+def generate_input(n, seed=0):
+    # Greedy_or_not input with n numbers in the same range as testcases/input9.txt and input10.txt
+    rng = random.Random(seed)
+    return f'{n}\n' + ' '.join(str(rng.randint(-10**9, 10**9)) for _ in range(n)) + '\n'
+
+
+def log_log_slope(points):
+    # least-squares slope of log(seconds) against log(n)
+    xs = [math.log(n) for n, _ in points]
+    ys = [math.log(seconds) for _, seconds in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+
+def classify(points, exhausted_at=None):
+    """ Guess the complexity class from (n, seconds) timings with the start-up time already subtracted.
+
+    :param exhausted_at: n at which a run was killed for taking far longer than the budget, if one was
+    :return: (one of COMPLEXITY_CLASSES, fitted log-log slope or None)
+    """
+    measurable = [(n, seconds) for n, seconds in points if seconds >= MIN_MEASURABLE]
+    slope = log_log_slope(measurable[-FIT_POINTS:]) if len(measurable) >= 2 else None
+    if exhausted_at is not None and exhausted_at <= EXPONENTIAL_N:
+        return 'exponential', slope
+    if slope is None:
+        # too fast to measure over the whole sweep
+        return 'O(n)', slope
+    if log_log_slope(measurable[-2:]) > 5:
+        # the last step alone grew faster than any polynomial class
+        return 'exponential', slope
+    if slope < 1.5:
+        return 'O(n)', slope
+    if slope < 2.5:
+        return 'O(n^2)', slope
+    if slope < 3.5:
+        return 'O(n^3)', slope
+    return 'exponential', slope
+
+
+def measure_complexity(program_file, budget=DEFAULT_BUDGET, start=8, factor=2, max_n=2**16, mode=None, seed=0):
+    """ Run the program on generated inputs of geometrically increasing n until one takes longer than `budget` seconds
+    (or max_n is reached), then classify the timings with classify.
+
+    The run that crosses the budget is still used, unless it takes longer than budget * factor^3, the most an
+    O(n^3) program can need after the previous size stayed within budget; then it is killed. The start-up time,
+    measured on n = 1, is subtracted from every timing first.
+
+    A run that ends in a runtime error stops the sweep: a crash is fast, and fitting its time would rate a program
+    that fails (or hits the recursion limit) at some n as O(n). Such a program is not classified.
+
+    :return: (complexity class or RUNTIME_ERROR, slope, list of (n, seconds) timings before any error, None or
+             (n, stderr) of the run that failed)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        expected = os.path.join(directory, 'expected.txt')
+        open(expected, 'w').close()
+
+        def time_once(n):
+            input_file = os.path.join(directory, f'input_{n}.txt')
+            with open(input_file, 'w') as f:
+                f.write(generate_input(n, seed))
+            return run_test_cases([(program_file, input_file, expected)], 1, budget * factor ** 3, mode)[0]
+
+        startup = math.inf
+        for _ in range(3):
+            result = time_once(1)
+            if result['verdict'] == RUNTIME_ERROR:
+                return RUNTIME_ERROR, None, [], (1, result['stderr'])
+            startup = min(startup, result['elapsed'])
+        points = []
+        exhausted_at = None
+        n = start
+        while n <= max_n:
+            result = time_once(n)
+            elapsed = result['elapsed']
+            if result['verdict'] == RUNTIME_ERROR:
+                return RUNTIME_ERROR, None, points, (n, result['stderr'])
+            if result['verdict'] == TIME_LIMIT_EXCEEDED:
+                exhausted_at = n
+                break
+            points.append((n, max(elapsed - startup, 0.0)))
+            if elapsed > budget:
+                exhausted_at = n
+                break
+            n *= factor
+    complexity, slope = classify(points, exhausted_at)
+    return complexity, slope, points, None
+
+
+def run_all_test_cases(program_file, workers=None, timeout=DEFAULT_TIMEOUT, testcase_dir='testcases', mode=None,
+                       repeat=1):
+    """ Grade one or more programs on every test case, printing one line per case.
+
+    :param program_file: path of the program or a list of paths (e.g. a whole class roster)
+    :param repeat: runs per case; with more than one the median and p95 wall time are printed
+    :return: list of result dicts, see run_test_cases (`repeat` of them per case)
+    """
+    program_files = [program_file] if isinstance(program_file, str) else list(program_file)
+    cases = find_test_cases(testcase_dir)
+    jobs = [
+        (program, input_file, output_file)
+        for program in program_files for input_file, output_file in cases for _ in range(repeat)
+    ]
+    results = run_test_cases(jobs, workers, timeout, mode)
+    report = summarize(results)
+    for program in program_files:
+        prefix = f'{program}: ' if len(program_files) > 1 else ''
+        for i, (input_file, _) in enumerate(cases):
+            stats = report[program][os.path.basename(input_file)]
+            if repeat > 1:
+                timing = f'median {stats["median"]:.3f}s, p95 {stats["p95"]:.3f}s'
+            else:
+                timing = f'{stats["median"]:.3f}s'
+            print(f'{prefix}Test case {i}: {stats["verdict"]} ({timing}, {stats["peak_rss_kb"] / 1024:.1f} MB)')
+    return results
 
-def run_test_case(input_file, output_file, program_file):
-    with open(input_file, 'r') as f:
-        input_data = f.read()
-
-    # Run the program as a subprocess
-    # print("---------------------------------------")
-    # print("Started Running")
-    result = subprocess.run(['/usr/bin/python3', program_file], input=input_data, text=True, capture_output=True)
-    # print("Finished Runnign")
-    actual_output = result.stdout.strip()
-    expected_output = open(output_file, 'r').read().strip()
-    return actual_output == expected_output
-
-def run_all_test_cases(program_file):
-    for i in range(11):
-        input_file = f'testcases/input{i}.txt'
-        output_file = f'testcases/output{i}.txt'
-        if run_test_case(input_file, output_file, program_file):
-            print(f'Test case {i}: PASSED')
-        else:
-            print(f'Test case {i}: FAILED')
 
 if __name__ == "__main__":
-    program_file = 'Greedy_Or_Not.py'  
-    run_all_test_cases(program_file)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('programs', type=str, nargs='*', default=['Greedy_or_not.py'], help='programs to grade')
+    parser.add_argument('--workers', type=int, default=None, help='cases run at once, defaults to the number of cores')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='seconds of wall-clock time per case')
+    parser.add_argument('--testcases', type=str, default='testcases', help='directory with inputN.txt/outputN.txt')
+    parser.add_argument('--mode', type=str, default=None, choices=MODES,
+                        help='fork a warm grader per case (default where available) or start a new interpreter')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case for benchmarking (use with --workers 1)')
+    parser.add_argument('--report', type=str, default=None, help='write the per-case timings to this JSON file')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON report to check for regressions against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative growth of time or memory over the baseline that counts as a regression')
+    parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA,
+                        help='seconds a case must slow down by, on top of --threshold, to count as a regression')
+    parser.add_argument('--complexity', action='store_true',
+                        help='estimate the complexity of each program on generated inputs before grading it')
+    parser.add_argument('--max-complexity', type=str, default=None, choices=COMPLEXITY_CLASSES,
+                        help='with --complexity, reject programs worse than this instead of grading them')
+    parser.add_argument('--budget', type=float, default=DEFAULT_BUDGET,
+                        help='seconds per generated input before the complexity sweep stops')
+    arguments = parser.parse_args()
+    mode = arguments.mode or default_mode()
+
+    programs = arguments.programs
+    rejected = []
+    if arguments.complexity:
+        for program in arguments.programs:
+            complexity, slope, points, error = measure_complexity(program, arguments.budget, mode=mode)
+            sizes = ', '.join(f'n={n}: {seconds:.3f}s' for n, seconds in points)
+            if error is not None:
+                error_n, stderr = error
+                last_line = stderr.strip().splitlines()[-1] if stderr.strip() else 'no error output'
+                print(f'{program}: not classified, runtime error at n={error_n} ({last_line}) [{sizes}]')
+                if arguments.max_complexity:
+                    print(f'{program}: REJECTED, failed the complexity sweep')
+                    rejected.append(program)
+                continue
+            print(f'{program}: {complexity}' + (f' (log-log slope {slope:.2f})' if slope is not None else '')
+                  + f' [{sizes}]')
+            if arguments.max_complexity and (COMPLEXITY_CLASSES.index(complexity)
+                                             > COMPLEXITY_CLASSES.index(arguments.max_complexity)):
+                print(f'{program}: REJECTED, worse than {arguments.max_complexity}')
+                rejected.append(program)
+        programs = [program for program in arguments.programs if program not in rejected]
+        if not programs:
+            sys.exit(1)
+    results = run_all_test_cases(programs, arguments.workers, arguments.timeout, arguments.testcases,
+                                 mode, arguments.repeat)
+    report = summarize(results)
+    if arguments.report:
+        write_report(report, arguments.report, arguments.repeat, mode)
+    regressions = []
+    if arguments.baseline:
+        baseline, baseline_mode = load_report(arguments.baseline)
+        if baseline_mode is None:
+            print(f'WARNING {arguments.baseline} does not record its mode; peak RSS is only comparable between runs '
+                  f'in the same mode')
+        try:
+            regressions = find_regressions(report, baseline, arguments.threshold, arguments.min_delta, mode,
+                                           baseline_mode)
+        except ValueError as e:
+            print(f'Cannot compare against {arguments.baseline}: {e}')
+            sys.exit(1)
+        for program, case, metric, old, new in regressions:
+            print(f'REGRESSION {program} {case} {metric}: {old:.4g} -> {new:.4g}'
+                  if metric != 'verdict' else f'REGRESSION {program} {case}: {old} -> {new}')
+        if not regressions:
+            print('No regressions against', arguments.baseline)
+    sys.exit(0 if all(result['verdict'] == PASSED for result in results) and not (regressions or rejected) else 1)
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+import time
+
+from Greedy_or_not import dp, dp_numpy, dp_parallel, get_prefix_sum, np
+
+
+def random_instance(n, seed=0):
+    # values in the same range as testcases/input9.txt and input10.txt
+    rng = random.Random(seed)
+    return [rng.randint(-10**9, 10**9) for _ in range(n)]
+
+
+def time_dp(v, repeat=1, backend='auto'):
+    # best wall time (seconds) of `repeat` runs of dp over the whole list, together with its result
+    prefix_sum = get_prefix_sum(v)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = dp(v, 0, len(v)-1, prefix_sum, backend)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def time_parallel(sizes, worker_counts, seed=0):
+    # speed-up of the shared-memory wavefront solver over the serial numpy sweep, per core count
+    print(f'{"n":>8} {"workers":>8} {"seconds":>10} {"speed-up":>10}')
+    for n in sizes:
+        v = random_instance(n, seed)
+        prefix_sum = get_prefix_sum(v)
+        start = time.perf_counter()
+        expected = dp_numpy(v, 0, n-1, prefix_sum)
+        serial = time.perf_counter() - start
+        print(f'{n:>8} {"serial":>8} {serial:>10.3f} {1:>9.2f}x')
+        for workers in worker_counts:
+            start = time.perf_counter()
+            result = dp_parallel(v, 0, n-1, prefix_sum, workers)
+            elapsed = time.perf_counter() - start
+            if result != expected:
+                raise AssertionError(f'parallel result {result} != serial result {expected} for n={n}')
+            print(f'{n:>8} {workers:>8} {elapsed:>10.3f} {serial / elapsed:>9.2f}x')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the interval DP of Greedy_or_not.py')
+    parser.add_argument('sizes', type=int, nargs='*', default=[100, 316, 1000, 3162, 10000],
+                        help='list sizes to time')
+    parser.add_argument('--backends', type=str, nargs='+', default=['python', 'numpy'], choices=['python', 'numpy'])
+    parser.add_argument('--repeat', type=int, default=1, help='runs per size, the best one is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--parallel', action='store_true',
+                        help='compare the parallel wavefront solver against the serial numpy sweep instead')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='core counts for --parallel, defaults to powers of two up to the number of cores')
+    arguments = parser.parse_args()
+
+    if arguments.parallel:
+        if np is None:
+            raise ImportError('--parallel needs numpy to be installed')
+        cores = os.cpu_count() or 1
+        worker_counts = arguments.workers or [2**i for i in range(cores.bit_length()) if 2**i <= cores]
+        time_parallel(arguments.sizes, worker_counts, arguments.seed)
+        return
+
+    backends = arguments.backends
+    if np is None and 'numpy' in backends:
+        print('numpy is not installed, skipping the numpy backend')
+        backends = [backend for backend in backends if backend != 'numpy']
+
+    print(f'{"n":>8}' + ''.join(f' {backend:>10}' for backend in backends)
+          + (f' {"speed-up":>10}' if len(backends) == 2 else ''))
+    for n in arguments.sizes:
+        v = random_instance(n, arguments.seed)
+        timings = []
+        results = set()
+        for backend in backends:
+            elapsed, result = time_dp(v, arguments.repeat, backend)
+            timings.append(elapsed)
+            results.add(result)
+        if len(results) > 1:
+            raise AssertionError(f'backends disagree for n={n}: {results}')
+        line = f'{n:>8}' + ''.join(f' {elapsed:>10.3f}' for elapsed in timings)
+        if len(timings) == 2:
+            line += f' {timings[0] / timings[1]:>9.1f}x'
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
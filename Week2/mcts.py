@@ -0,0 +1,251 @@
+import argparse
+import logging
+import math
+import random
+import time
+
+import misere_quotient
+import q2
+from notakto_engine import EMPTY_SQUARES, NotaktoPosition
+from q2 import IS_DEAD, History
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+DEFAULT_EXPLORATION = math.sqrt(2)
+
+
+def random_playout(masks, num_moves, rng):
+    """ Play random moves from the position until every board is dead: a random live board, then a random empty
+    square of it (a live board always has one, a full board has a line).
+
+    :param masks: 9-bit masks of the 'x' squares of the boards, not modified
+    :param num_moves: number of moves played before the position
+    :return: number of moves played at the end, even if player 1 won
+    """
+    masks = list(masks)
+    live = [board for board, mask in enumerate(masks) if not IS_DEAD[mask]]
+    random_ = rng.random
+    while live:
+        i = int(random_() * len(live))
+        board = live[i]
+        empty_squares = EMPTY_SQUARES[masks[board]]
+        mask = masks[board] | 1 << empty_squares[int(random_() * len(empty_squares))]
+        masks[board] = mask
+        num_moves += 1
+        if IS_DEAD[mask]:
+            live[i] = live[-1]
+            live.pop()
+    return num_moves
+
+
+class Node:
+    """ Node of the search tree. Children are keyed by the Zobrist hash of the position after the move, so moves to
+    symmetric positions share one child; moves maps those hashes to an action for the boards as laid out in masks.
+    """
+    __slots__ = ('masks', 'moves', 'untried', 'children', 'visits', 'wins')
+
+    def __init__(self):
+        self.masks = None
+        self.moves = None
+        self.untried = None
+        self.children = {}
+        self.visits = 0
+        # playouts won by the player who moved into this node
+        self.wins = 0
+
+
+class MCTSEngine:
+    """ Monte Carlo tree search over a NotaktoPosition with UCT selection and random playouts. The tree is kept
+    between moves: best_action follows the game from one call to the next and searches on from the subtree of the
+    position reached, whatever the orientation of its boards.
+    """
+
+    def __init__(self, num_boards=2, exploration=DEFAULT_EXPLORATION, seed=None):
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.playouts = 0
+        self.reset(num_boards)
+
+    def reset(self, num_boards):
+        self.position = NotaktoPosition(num_boards)
+        self.root = Node()
+
+    def _moves(self, node):
+        # hash of the position after each distinct move -> action, for the boards as they are laid out now
+        masks = tuple(self.position.masks)
+        if node.masks != masks:
+            node.masks = masks
+            node.moves = {}
+            for action in self.position.get_valid_actions():
+                node.moves.setdefault(self.position.get_zobrist_hash_after(action), action)
+            if node.untried is None:
+                node.untried = list(node.moves)
+        return node.moves
+
+    def advance(self, action):
+        """ Play action, keeping the subtree of the position it leads to as the new root. """
+        child_hash = self.position.get_zobrist_hash_after(action)
+        self.position.make(action)
+        self.root = self.root.children.get(child_hash) or Node()
+
+    def sync(self, history_obj):
+        # move the root to the position of history_obj, reusing the tree when it follows the moves already played
+        played = self.position.history
+        if history_obj.num_boards != self.position.num_boards or history_obj.history[:len(played)] != played:
+            self.reset(history_obj.num_boards)
+        for action in history_obj.history[len(self.position.history):]:
+            self.advance(action)
+
+    def iterate(self):
+        """ One selection, expansion, playout and backpropagation from the root. """
+        position = self.position
+        root_moves = len(position.history)
+        node = self.root
+        path = [node]
+        while position.live_boards:
+            moves = self._moves(node)
+            if node.untried:
+                # expand a random untried move
+                child_hash = node.untried.pop(int(self.rng.random() * len(node.untried)))
+                position.make(moves[child_hash])
+                node.children[child_hash] = node = Node()
+                path.append(node)
+                break
+            log_visits = math.log(node.visits)
+            best_score = -math.inf
+            for child_hash, child in node.children.items():
+                score = child.wins / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+                if score > best_score:
+                    best_score, best_hash = score, child_hash
+            position.make(moves[best_hash])
+            node = node.children[best_hash]
+            path.append(node)
+
+        num_moves = random_playout(position.masks, len(position.history), self.rng)
+        self.playouts += 1
+        # the node at path[i] was entered by move root_moves + i - 1, won by its player when it has the parity of
+        # the number of moves played at the end
+        for i, node in enumerate(path):
+            node.visits += 1
+            if (root_moves + i - 1 - num_moves) % 2 == 0:
+                node.wins += 1
+        for _ in range(len(path) - 1):
+            position.unmake(position.history[-1])
+
+    def search(self, seconds=None, playouts=None):
+        """ Iterate until seconds have passed or playouts were made, whichever comes first (one second if neither is
+        given).
+
+        :return: number of playouts made
+        """
+        if seconds is None and playouts is None:
+            seconds = 1.0
+        deadline = time.perf_counter() + seconds if seconds is not None else math.inf
+        count = 0
+        while (playouts is None or count < playouts) and (count & 63 or time.perf_counter() < deadline):
+            self.iterate()
+            count += 1
+        return count
+
+    def best_action(self, history_obj, seconds=None, playouts=None):
+        """ Search the position of history_obj within the budget and return its most visited move.
+
+        :param history_obj: q2.History, not finished
+        :return: action, an int between 0-(9n-1)
+        """
+        self.sync(history_obj)
+        self.search(seconds, playouts)
+        moves = self._moves(self.root)
+        if not self.root.children:
+            return next(iter(moves.values()))
+        best_hash = max(self.root.children, key=lambda child_hash: self.root.children[child_hash].visits)
+        return moves[best_hash]
+
+    def tree_size(self):
+        count = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children.values())
+        return count
+
+
+def maxmin_action(history_obj, rng):
+    # a random move among those with the best q2.maxmin value for the player to move
+    maximize = history_obj.current_player == 1
+    values = {}
+    for action in history_obj.get_valid_actions():
+        child = History(history=history_obj.history + [action], num_boards=history_obj.num_boards)
+        values[action] = q2.maxmin(child, not maximize)
+    best_value = max(values.values()) if maximize else min(values.values())
+    return rng.choice([action for action, value in values.items() if value == best_value])
+
+
+def quotient_action(history_obj, rng):
+    # a random winning move by misere_quotient, else a random move
+    return rng.choice(misere_quotient.winning_moves(history_obj) or history_obj.get_valid_actions())
+
+
+def play(num_boards, mcts_player, opponent, seconds, playouts, rng):
+    """ Play one game of MCTSEngine against opponent(history_obj, rng).
+
+    :param mcts_player: 1 or 2, the player MCTS plays
+    :return: (winner, number of MCTS moves, number of them that were winning moves by misere_quotient in positions
+              that had one)
+    """
+    engine = MCTSEngine(num_boards, seed=rng.random())
+    history_obj = History(history=[], num_boards=num_boards)
+    moves = correct = 0
+    while not history_obj.is_win():
+        if history_obj.current_player == mcts_player:
+            action = engine.best_action(history_obj, seconds, playouts)
+            winning_moves = misere_quotient.winning_moves(history_obj)
+            if winning_moves:
+                moves += 1
+                correct += action in winning_moves
+        else:
+            action = opponent(history_obj, rng)
+        history_obj = History(history=history_obj.history + [action], num_boards=num_boards)
+    winner = 1 if history_obj.get_value_given_terminal_history() == 1 else 2
+    return winner, moves, correct
+
+
+def benchmark(board_counts, games, seconds, playouts, seed=0):
+    """ Log, for each number of boards: playouts per second and tree size after one search of the empty game, and
+    the results of games of MCTS against an exact opponent, as each player. The opponent is q2.maxmin on up to 2
+    boards and misere_quotient beyond, both picking at random among their best moves. Accuracy is the share of MCTS
+    moves that were winning moves, counted in positions that had one.
+    """
+    rng = random.Random(seed)
+    logging.info("{:>6} {:>11} {:>9} {:>8} {:>12} {:>12} {:>9}".format(
+        'boards', 'playouts/s', 'tree', 'opponent', 'wins as p1', 'wins as p2', 'accuracy'))
+    for num_boards in board_counts:
+        engine = MCTSEngine(num_boards, seed=seed)
+        start = time.perf_counter()
+        count = engine.search(seconds, playouts)
+        rate = count / (time.perf_counter() - start)
+        opponent, opponent_name = (maxmin_action, 'maxmin') if num_boards <= 2 else (quotient_action, 'quotient')
+        wins = {1: 0, 2: 0}
+        moves = correct = 0
+        for game in range(games):
+            for mcts_player in (1, 2):
+                winner, game_moves, game_correct = play(num_boards, mcts_player, opponent, seconds, playouts, rng)
+                wins[mcts_player] += winner == mcts_player
+                moves += game_moves
+                correct += game_correct
+        logging.info("{:>6} {:>11.0f} {:>9} {:>8} {:>12} {:>12} {:>9}".format(
+            num_boards, rate, engine.tree_size(), opponent_name, '{}/{}'.format(wins[1], games),
+            '{}/{}'.format(wins[2], games), '{:.0%}'.format(correct / moves) if moves else '-'))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-boards', type=int, nargs='+', default=[1, 2, 3, 5, 8])
+    parser.add_argument('--games', type=int, default=10, help='games per number of boards as each player')
+    parser.add_argument('--seconds', type=float, default=0.2, help='search time per move')
+    parser.add_argument('--playouts', type=int, default=None, help='playouts per move, before the time runs out')
+    parser.add_argument('--seed', type=int, default=0)
+    arguments = parser.parse_args()
+    benchmark(arguments.num_boards, arguments.games, arguments.seconds, arguments.playouts, arguments.seed)
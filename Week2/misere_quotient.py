@@ -0,0 +1,191 @@
+import argparse
+import logging
+import time
+
+import q2
+from q2 import CANONICAL_BOARD, History
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+# Plambeck's misere quotient of Notakto: the commutative monoid
+#   Q = < a, b, c, d | a^2 = 1, b^3 = b, b^2 c = c, c^3 = a c^2, b^2 d = d, c d = a d, d^2 = c^2 >
+# with 18 elements. Every board has a value in Q, the value of a position is the product of the values of its boards,
+# and the player to move loses exactly when that product is in P_ELEMENTS. No search is needed, whatever the number of
+# boards.
+#
+# Elements are written as exponents (a, b, c, d) of their normal form, which reduce() computes.
+P_ELEMENTS = {(1, 0, 0, 0), (0, 2, 0, 0), (0, 1, 1, 0), (0, 0, 2, 0)}  # a, b^2, bc, c^2
+IDENTITY = (0, 0, 0, 0)
+
+# Value of every live board, keyed by its canonical mask (q2.CANONICAL_BOARD). Dead boards are worth the identity.
+# The table was computed offline: values were assigned to the boards by backtracking, each assignment checked against
+# the outcome of every position of 1-3 boards found by an exact search; the result was then checked on random
+# positions of 4-6 boards.
+BOARD_VALUE_NAMES = {
+    0: 'c', 1: '1', 2: '1', 3: 'ad', 5: 'b', 10: 'a', 11: 'b', 12: 'b', 13: 'a', 14: 'd', 16: 'c2', 17: 'b', 18: 'b',
+    19: 'ab', 21: 'a', 26: 'ab', 27: 'a', 28: 'a', 29: 'b', 30: 'b', 40: 'a', 41: 'd', 42: 'b', 43: 'a', 45: 'b',
+    68: 'a', 69: 'ab', 70: 'd', 78: 'ab', 97: 'a', 98: '1', 99: 'b', 101: 'b', 102: 'a', 106: 'ab', 108: 'a', 110: 'b',
+    113: 'b', 114: 'b', 115: 'a', 170: 'a', 171: 'b', 173: 'a', 229: 'a', 238: 'a', 325: 'a',
+}
+
+
+def reduce(element):
+    """ Normal form of a product a^i b^j c^k d^l under the relations of Q.
+
+    :param element: tuple (i, j, k, l) of exponents
+    :return: tuple of exponents of the normal form
+    """
+    i, j, k, l = element
+    while True:
+        before = (i, j, k, l)
+        while l >= 2:  # d^2 = c^2
+            l -= 2
+            k += 2
+        if l and k:  # c d = a d
+            i += k
+            k = 0
+        if (k or l) and j >= 2:  # b^2 c = c, b^2 d = d
+            j %= 2
+        if j >= 3:  # b^3 = b
+            j = 1 + (j - 1) % 2
+        if k >= 3:  # c^3 = a c^2
+            i += k - 2
+            k = 2
+        i %= 2  # a^2 = 1
+        if (i, j, k, l) == before:
+            return before
+
+
+def parse_element(name):
+    # 'ab', 'c2', '1' -> tuple of exponents
+    exponents = [0, 0, 0, 0]
+    for generator, power in zip(name, name[1:] + ' '):
+        if generator in 'abcd':
+            exponents['abcd'.index(generator)] += int(power) if power.isdigit() else 1
+    return reduce(tuple(exponents))
+
+
+def element_name(element):
+    return ''.join(generator + (str(power) if power > 1 else '')
+                   for generator, power in zip('abcd', element) if power) or '1'
+
+
+ELEMENTS = sorted({reduce((i, j, k, l)) for i in range(2) for j in range(3) for k in range(3) for l in range(2)})
+# Elements are used by index: MULTIPLY[x][y] is the index of ELEMENTS[x] * ELEMENTS[y]
+ELEMENT_INDEX = {element: index for index, element in enumerate(ELEMENTS)}
+MULTIPLY = [[ELEMENT_INDEX[reduce(tuple(p + q for p, q in zip(x, y)))] for y in ELEMENTS] for x in ELEMENTS]
+IS_P = [element in P_ELEMENTS for element in ELEMENTS]
+# HAS_LINE[mask] is True when the board has a complete line
+HAS_LINE = [History.is_board_win(['x' if mask >> i & 1 else '0' for i in range(9)]) for mask in range(512)]
+# BOARD_VALUE[mask]: index of the value of any board, given as a 9-bit mask of its 'x' squares
+BOARD_VALUE = [ELEMENT_INDEX[IDENTITY]] * 512
+for _mask in range(512):
+    if CANONICAL_BOARD[_mask] in BOARD_VALUE_NAMES:
+        BOARD_VALUE[_mask] = ELEMENT_INDEX[parse_element(BOARD_VALUE_NAMES[CANONICAL_BOARD[_mask]])]
+
+
+def board_masks(history_obj):
+    # 9-bit mask of the 'x' squares of each board of a q2.History
+    masks = [0] * history_obj.num_boards
+    for action in history_obj.history:
+        masks[action // 9] |= 1 << (action % 9)
+    return masks
+
+
+def position_value(masks):
+    """ Value in Q (index into ELEMENTS) of the position made of the given boards. """
+    value = ELEMENT_INDEX[IDENTITY]
+    for mask in masks:
+        value = MULTIPLY[value][BOARD_VALUE[mask]]
+    return value
+
+
+def is_p_position(history_obj):
+    """ True if the player to move loses with optimal play (a P-position), False if they win (an N-position). """
+    return IS_P[position_value(board_masks(history_obj))]
+
+
+def value(history_obj):
+    """ Value of the history as q2.maxmin computes it: 1 if player 1 wins, -1 if player 2 wins. """
+    mover_wins = not is_p_position(history_obj)
+    return 1 if mover_wins == (history_obj.current_player == 1) else -1
+
+
+def winning_moves(history_obj):
+    """ Actions (as in q2.History.history) that leave the opponent in a P-position; empty in a P-position. """
+    masks = board_masks(history_obj)
+    # suffix[i]: product of the values of boards i, i+1, ...
+    suffix = [ELEMENT_INDEX[IDENTITY]] * (len(masks) + 1)
+    for board in range(len(masks) - 1, -1, -1):
+        suffix[board] = MULTIPLY[BOARD_VALUE[masks[board]]][suffix[board + 1]]
+    prefix = ELEMENT_INDEX[IDENTITY]
+    moves = []
+    for board, mask in enumerate(masks):
+        # product of the values of all the other boards
+        others = MULTIPLY[prefix][suffix[board + 1]]
+        prefix = MULTIPLY[prefix][BOARD_VALUE[mask]]
+        if HAS_LINE[mask]:
+            continue
+        for square in range(9):
+            if not mask >> square & 1 and IS_P[MULTIPLY[others][BOARD_VALUE[mask | 1 << square]]]:
+                moves.append(9 * board + square)
+    return moves
+
+
+def winning_move(history_obj):
+    # first winning action, or None in a P-position
+    moves = winning_moves(history_obj)
+    return moves[0] if moves else None
+
+
+def cross_validate(num_boards):
+    """ Compare value() with q2.maxmin on every position maxmin caches while solving the empty game of num_boards
+    boards, i.e. on every canonical position of the game.
+
+    :return: (number of positions compared, number of disagreements)
+    """
+    q2.board_positions_val_dict.clear()
+    q2.maxmin(History(history=[], num_boards=num_boards), True)
+    mismatches = 0
+    for (parity, live_boards), maxmin_value in q2.board_positions_val_dict.items():
+        mover_wins = not IS_P[position_value(live_boards)]
+        if (1 if mover_wins == (parity == 0) else -1) != maxmin_value:
+            mismatches += 1
+    compared = len(q2.board_positions_val_dict)
+    q2.board_positions_val_dict.clear()
+    return compared, mismatches
+
+
+def time_queries(num_boards, repeat=1000):
+    # microseconds per is_p_position and per winning_move query on the empty game of num_boards boards
+    history_obj = History(history=[], num_boards=num_boards)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        is_p_position(history_obj)
+    outcome_time = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        winning_move(history_obj)
+    move_time = (time.perf_counter() - start) / repeat
+    return 1e6 * outcome_time, 1e6 * move_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cross-validate', type=int, nargs='*', default=[1, 2, 3], metavar='NUM_BOARDS',
+                        help='numbers of boards to check against q2.maxmin')
+    parser.add_argument('--num-boards', type=int, nargs='*', default=[1, 2, 3, 4, 5, 10, 100],
+                        help='numbers of boards to solve and time')
+    arguments = parser.parse_args()
+
+    for num_boards in arguments.cross_validate:
+        compared, mismatches = cross_validate(num_boards)
+        logging.info("{} boards: {} positions compared with maxmin, {} disagreements".format(
+            num_boards, compared, mismatches))
+    for num_boards in arguments.num_boards:
+        history_obj = History(history=[], num_boards=num_boards)
+        outcome_us, move_us = time_queries(num_boards)
+        logging.info("{} boards: value {} ({}), winning move {}; {:.1f} us per outcome, {:.1f} us per move".format(
+            num_boards, element_name(ELEMENTS[position_value(board_masks(history_obj))]),
+            'P' if is_p_position(history_obj) else 'N', winning_move(history_obj), outcome_us, move_us))
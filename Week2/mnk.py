@@ -0,0 +1,352 @@
+import argparse
+import logging
+import math
+import time
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+WIN = 1000000  # value of a proven win for the player to move; heuristic values stay far below it
+UNBOUNDED_DEPTH = 1 << 30  # depth stored with proven results, which no deeper search can change
+
+# Transposition table entry flags
+EXACT = 0
+LOWER = 1  # the value is a lower bound (the search failed high)
+UPPER = 2  # the value is an upper bound (the search failed low)
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class MNKGame:
+    """ The m,n,k-game: two players alternately mark squares of an m x n board ('x' moves first) and the first to get
+    k marks in a row, column or diagonal wins. Tic-tac-toe is MNKGame(3, 3, 3).
+
+    Squares are numbered row by row as in q1 (square r * n + c), and a set of squares is a bitboard with bit i for
+    square i.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        self.m = m
+        self.n = n
+        self.k = k
+        self.size = m * n
+        self.full_board = (1 << self.size) - 1
+
+        self.lines = []
+        for r in range(m):
+            for c in range(n):
+                for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    if 0 <= r + (k - 1) * dr < m and 0 <= c + (k - 1) * dc < n:
+                        self.lines.append(sum(1 << ((r + i * dr) * n + c + i * dc) for i in range(k)))
+        # lines_through[square]: the lines a move on square can complete
+        self.lines_through = [[line for line in self.lines if line >> square & 1] for square in range(self.size)]
+        # squares on more lines first: the static move order of the search
+        self.move_order = sorted(range(self.size), key=lambda square: -len(self.lines_through[square]))
+
+        # Symmetries of the board as permutations: square i of the transformed board is square symmetry[i] of the
+        # original one. Square boards have all 8, rectangular ones the 4 that do not swap rows and columns.
+        self.symmetries = []
+        for swap in ((False, True) if m == n else (False,)):
+            for flip_rows in (False, True):
+                for flip_columns in (False, True):
+                    symmetry = []
+                    for r in range(m):
+                        for c in range(n):
+                            rr, cc = (c, r) if swap else (r, c)
+                            if flip_rows:
+                                rr = m - 1 - rr
+                            if flip_columns:
+                                cc = n - 1 - cc
+                            symmetry.append(rr * n + cc)
+                    self.symmetries.append(symmetry)
+        # Bitboards are transformed 8 bits at a time: _symmetry_tables[s][j][byte] is the transformed image of
+        # `byte` placed at bits 8j..8j+7
+        self._symmetry_tables = []
+        for symmetry in self.symmetries:
+            image = [0] * self.size
+            for i, square in enumerate(symmetry):
+                image[square] = i
+            self._symmetry_tables.append([
+                [sum(1 << image[8 * j + b] for b in range(8) if byte >> b & 1 and 8 * j + b < self.size)
+                 for byte in range(256)]
+                for j in range((self.size + 7) // 8)
+            ])
+
+    def move_key(self, square):
+        """ Text a move adds to a history key of build_policy: the square as one digit, as in q1, while squares are 0-9,
+        else the square followed by a comma, so that [1, 10] ("1,10,") and [11, 0] ("11,0,") get different keys.
+        """
+        return str(square) if self.size <= 10 else str(square) + ','
+
+    def transform(self, mask, s):
+        # bitboard mask under symmetry s
+        result = 0
+        for table in self._symmetry_tables[s]:
+            result |= table[mask & 0xFF]
+            mask >>= 8
+        return result
+
+    def canonical(self, x, o):
+        """ Smallest (x, o) key among the symmetric variants of a position.
+
+        :return: (key, index of the symmetry producing it)
+        """
+        best_key = None
+        best_symmetry = 0
+        for s in range(len(self.symmetries)):
+            key = self.transform(x, s) << self.size | self.transform(o, s)
+            if best_key is None or key < best_key:
+                best_key = key
+                best_symmetry = s
+        return best_key, best_symmetry
+
+    def completes_line(self, mask, square):
+        # True if adding square to the player's squares in mask completes one of its lines
+        mask |= 1 << square
+        for line in self.lines_through[square]:
+            if mask & line == line:
+                return True
+        return False
+
+    def winner(self, x, o):
+        for line in self.lines:
+            if x & line == line:
+                return 'x'
+            if o & line == line:
+                return 'o'
+        return None
+
+    def evaluate(self, mine, theirs):
+        # Heuristic value for the player to move at the search horizon: lines still open to one player only, weighted
+        # by how many of their marks are already on them
+        score = 0
+        for line in self.lines:
+            if not line & theirs:
+                score += 4 ** bin(line & mine).count('1')
+            elif not line & mine:
+                score -= 4 ** bin(line & theirs).count('1')
+        return score
+
+
+class MNKPosition:
+    """ Bitboard position of an MNKGame, with in-place make/unmake like q1.Position. """
+    __slots__ = ('x', 'o', 'num_moves')
+
+    def __init__(self, x=0, o=0, num_moves=0):
+        self.x = x
+        self.o = o
+        self.num_moves = num_moves
+
+    @classmethod
+    def from_history(cls, history):
+        position = cls()
+        for action in history:
+            position.make(action)
+        return position
+
+    def player(self):
+        return 'x' if self.num_moves % 2 == 0 else 'o'
+
+    def make(self, square):
+        if self.num_moves & 1:
+            self.o |= 1 << square
+        else:
+            self.x |= 1 << square
+        self.num_moves += 1
+
+    def unmake(self, square):
+        self.num_moves -= 1
+        if self.num_moves & 1:
+            self.o &= ~(1 << square)
+        else:
+            self.x &= ~(1 << square)
+
+
+class MNKSolver:
+    """ Negamax alpha-beta search with a symmetry-reduced transposition table and iterative deepening.
+
+    Values are from the point of view of the player to move: WIN / -WIN for a proven win / loss, anything in between
+    is a draw (0, proven only by a full-depth search) or a heuristic estimate from the horizon. The transposition table
+    is keyed by the canonical position and keeps the best move in canonical coordinates, so symmetric positions share
+    both the value and the move to try first.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        # canonical key -> (depth, flag, value, best move in canonical coordinates)
+        self.transposition_table = {}
+        self.nodes = 0
+        self.deadline = None
+
+    def _search(self, position, depth, alpha, beta):
+        game = self.game
+        self.nodes += 1
+        if self.deadline is not None and self.nodes & 1023 == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        empty = game.size - position.num_moves
+        if empty == 0:
+            return 0
+        depth = min(depth, empty)
+        key, symmetry = game.canonical(position.x, position.o)
+        entry = self.transposition_table.get(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, flag, value, move = entry
+            if entry_depth >= depth:
+                if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                    return value
+            if move is not None:
+                tt_move = game.symmetries[symmetry][move]
+
+        if position.num_moves & 1:
+            mine, theirs = position.o, position.x
+        else:
+            mine, theirs = position.x, position.o
+        if depth == 0:
+            return game.evaluate(mine, theirs)
+
+        occupied = position.x | position.o
+        moves = [square for square in game.move_order if not occupied >> square & 1]
+        if tt_move is not None:
+            moves.remove(tt_move)
+            moves.insert(0, tt_move)
+
+        original_alpha = alpha
+        best_value = -math.inf
+        best_move = None
+        for square in moves:
+            if game.completes_line(mine, square):
+                value = WIN
+            else:
+                position.make(square)
+                value = -self._search(position, depth - 1, -beta, -alpha)
+                position.unmake(square)
+            if value > best_value:
+                best_value = value
+                best_move = square
+            if value > alpha:
+                alpha = value
+            if alpha >= beta:
+                break
+
+        if best_value <= original_alpha:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        proven = (best_value >= WIN and flag != UPPER) or (best_value <= -WIN and flag != LOWER)
+        # best_move is in this position's coordinates; the table stores it for the canonical orientation
+        canonical_move = game.symmetries[symmetry].index(best_move)
+        self.transposition_table[key] = (UNBOUNDED_DEPTH if proven else depth, flag, best_value, canonical_move)
+        return best_value
+
+    def best_move(self, position):
+        # best move at position from the transposition table after a search of it
+        key, symmetry = self.game.canonical(position.x, position.o)
+        entry = self.transposition_table.get(key)
+        if entry is None or entry[3] is None:
+            return None
+        return self.game.symmetries[symmetry][entry[3]]
+
+    def solve(self, position, time_limit=None, max_depth=None):
+        """ Iteratively deepen the search of position until it is solved (a proven win/loss, or a full-depth search),
+        max_depth is reached or time_limit seconds have passed.
+
+        :return: dict with value, best_move, depth (of the last completed iteration), exact (whether value is proven),
+                 nodes, seconds and nodes_per_second
+        """
+        start = time.perf_counter()
+        self.deadline = start + time_limit if time_limit is not None else None
+        nodes_before = self.nodes
+        empty = self.game.size - position.num_moves
+        max_depth = min(max_depth or empty, empty)
+        result = {'value': None, 'best_move': None, 'depth': 0, 'exact': False}
+        try:
+            for depth in range(1, max_depth + 1):
+                value = self._search(position, depth, -math.inf, math.inf)
+                result = {
+                    'value': value, 'best_move': self.best_move(position), 'depth': depth,
+                    'exact': abs(value) >= WIN or depth == empty,
+                }
+                if result['exact']:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+        result['nodes'] = self.nodes - nodes_before
+        result['seconds'] = time.perf_counter() - start
+        result['nodes_per_second'] = result['nodes'] / result['seconds'] if result['seconds'] > 0 else 0.0
+        return result
+
+    def policy(self, history, time_limit=None):
+        """ Strategy for one history in the format of q1.strategy_dict_x/strategy_dict_o: a dict from every square (as
+        str) to the probability of playing it, 1 for the chosen move.
+        """
+        position = MNKPosition.from_history(history)
+        result = self.solve(position, time_limit)
+        distribution = {str(square): 0 for square in range(self.game.size)}
+        if result['best_move'] is not None:
+            distribution[str(result['best_move'])] = 1
+        return distribution
+
+    def build_policy(self, player='x', history=None, time_limit=None):
+        """ Strategy dict (history str -> distribution, as in q1) for every history the bot playing `player` can reach
+        from `history` when it follows its own policy and the opponent plays anything. History strings are made of
+        MNKGame.move_key of each move: one digit per move as in q1 on boards of up to 10 squares, comma-terminated
+        squares on larger ones; policy_store.history_to_actions reads both.
+        """
+        policy = {}
+        position = MNKPosition.from_history(history or [])
+        self._build_policy(position, ''.join(map(self.game.move_key, history or [])), player, policy, time_limit)
+        return policy
+
+    def _build_policy(self, position, history_str, player, policy, time_limit):
+        if position.num_moves == self.game.size or self.game.winner(position.x, position.o):
+            return
+        if position.player() == player:
+            self.solve(position, time_limit)
+            move = self.best_move(position)
+            distribution = {str(square): 0 for square in range(self.game.size)}
+            distribution[str(move)] = 1
+            policy[history_str] = distribution
+            moves = [move]
+        else:
+            occupied = position.x | position.o
+            moves = [square for square in range(self.game.size) if not occupied >> square & 1]
+        for move in moves:
+            position.make(move)
+            self._build_policy(position, history_str + self.game.move_key(move), player, policy, time_limit)
+            position.unmake(move)
+
+
+def parse_board(spec):
+    # "4x4x4" -> (4, 4, 4)
+    m, n, k = (int(part) for part in spec.lower().split('x'))
+    return m, n, k
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--boards', type=str, nargs='+', default=['3x3x3', '4x4x4', '5x5x4'],
+                        help='board sizes to solve as MxNxK')
+    parser.add_argument('--time-limit', type=float, default=60.0, help='seconds per board size')
+    arguments = parser.parse_args()
+
+    for spec in arguments.boards:
+        m, n, k = parse_board(spec)
+        solver = MNKSolver(MNKGame(m, n, k))
+        result = solver.solve(MNKPosition(), arguments.time_limit)
+        if result['exact']:
+            outcome = 'first player wins' if result['value'] >= WIN else (
+                'second player wins' if result['value'] <= -WIN else 'draw')
+        else:
+            outcome = 'unsolved, heuristic value {}'.format(result['value'])
+        logging.info("{}: {} (depth {}, best move {}) in {:.2f}s, {} positions searched, {:.0f} positions/s, "
+                     "{} table entries".format(spec, outcome, result['depth'], result['best_move'], result['seconds'],
+                                               result['nodes'], result['nodes_per_second'],
+                                               len(solver.transposition_table)))
@@ -0,0 +1,321 @@
+import argparse
+import logging
+import math
+import time
+
+import q2
+import search_profiler
+from q2 import (CANONICAL_BOARD, EXACT, IS_DEAD, LOWER, UPPER, ZOBRIST_BOARD, ZOBRIST_PLAYER_2, HASH_MASK,
+                MOVE_ORDERINGS, History, TranspositionTable)
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+# EMPTY_SQUARES[mask] lists the empty squares of a board in increasing order
+EMPTY_SQUARES = [[j for j in range(9) if not mask >> j & 1] for mask in range(512)]
+
+
+class NotaktoPosition:
+    """ Mutable Notakto position: one 9-bit mask of 'x' squares per board, updated in place by make/unmake together
+    with the number of live boards and the Zobrist hash of q2.History.
+
+    It has the History methods MoveOrdering uses (get_board_mask, get_zobrist_hash_after, num_boards and history), so
+    the orderings of q2 apply to it unchanged.
+    """
+    __slots__ = ('num_boards', 'masks', 'live_boards', 'history', 'zobrist_hash')
+
+    def __init__(self, num_boards=2, history=None):
+        self.num_boards = num_boards
+        self.masks = [0] * num_boards
+        self.live_boards = num_boards
+        self.history = []
+        self.zobrist_hash = ZOBRIST_BOARD[CANONICAL_BOARD[0]] * num_boards & HASH_MASK
+        for action in history or []:
+            self.make(action)
+
+    def make(self, action):
+        board = action // 9
+        mask = self.masks[board]
+        new_mask = mask | 1 << (action % 9)
+        self.zobrist_hash = self.get_zobrist_hash_after(action)
+        self.masks[board] = new_mask
+        if IS_DEAD[new_mask]:
+            self.live_boards -= 1
+        self.history.append(action)
+
+    def unmake(self, action):
+        self.history.pop()
+        board = action // 9
+        new_mask = self.masks[board]
+        mask = new_mask & ~(1 << (action % 9))
+        self.masks[board] = mask
+        zobrist_hash = self.zobrist_hash + ZOBRIST_BOARD[CANONICAL_BOARD[mask]]
+        if IS_DEAD[new_mask]:
+            self.live_boards += 1
+        else:
+            zobrist_hash -= ZOBRIST_BOARD[CANONICAL_BOARD[new_mask]]
+        zobrist_hash += ZOBRIST_PLAYER_2 if len(self.history) % 2 else -ZOBRIST_PLAYER_2
+        self.zobrist_hash = zobrist_hash & HASH_MASK
+
+    def is_win(self):
+        return self.live_boards == 0
+
+    def get_value_given_terminal_history(self):
+        return 1 - 2 * (len(self.history) % 2)
+
+    def get_valid_actions(self):
+        # same actions in the same order as History.get_valid_actions
+        actions = []
+        for board, mask in enumerate(self.masks):
+            if not IS_DEAD[mask]:
+                offset = 9 * board
+                actions.extend(offset + square for square in EMPTY_SQUARES[mask])
+        return actions
+
+    def get_board_mask(self, board):
+        return self.masks[board]
+
+    def get_zobrist_hash(self):
+        return self.zobrist_hash
+
+    def get_zobrist_hash_after(self, action):
+        mask = self.masks[action // 9]
+        new_mask = mask | 1 << (action % 9)
+        zobrist_hash = self.zobrist_hash - ZOBRIST_BOARD[CANONICAL_BOARD[mask]]
+        if not IS_DEAD[new_mask]:
+            zobrist_hash += ZOBRIST_BOARD[CANONICAL_BOARD[new_mask]]
+        zobrist_hash += ZOBRIST_PLAYER_2 if len(self.history) % 2 == 0 else -ZOBRIST_PLAYER_2
+        return zobrist_hash & HASH_MASK
+
+    def get_canonical_key(self):
+        # same key as History.get_canonical_key
+        return len(self.history) % 2, tuple(sorted(CANONICAL_BOARD[mask] for mask in self.masks if not IS_DEAD[mask]))
+
+
+class SearchEngine:
+    """ q2.alpha_beta_pruning and q2.maxmin without recursion: the path from the root is an explicit stack of frames
+    over one NotaktoPosition, moves are made when a frame tries a child and unmade when the child's value comes back.
+    Both visit the same nodes in the same order as their recursive versions, with the same transposition table
+    logic and move ordering, so they return the same values and visited counts; no History is built and there is no
+    recursion limit.
+
+    Player 1 (even number of moves played) maximizes.
+    """
+
+    def __init__(self, table_size=q2.DEFAULT_TABLE_SIZE, move_ordering=None):
+        self.transposition_table = TranspositionTable(table_size)
+        self.move_ordering = move_ordering if move_ordering is not None else MOVE_ORDERINGS['hint']
+        # canonical key -> maxmin value, as q2.board_positions_val_dict
+        self.values = {}
+        self.visited = 0
+
+    def _probe(self, position, alpha, beta):
+        """ Start searching position: its value if it is terminal or answered by the transposition table, else the
+        frame to expand it.
+        """
+        self.visited += 1
+        stats = search_profiler.collector
+        if position.live_boards == 0:
+            if stats is not None:
+                stats.terminal_hits += 1
+            return position.get_value_given_terminal_history(), None
+        zobrist_hash = position.zobrist_hash
+        entry = self.transposition_table.probe(zobrist_hash)
+        hint_hash = None
+        original_alpha, original_beta = alpha, beta
+        if entry is not None:
+            if stats is not None:
+                stats.cache_hits += 1
+            value, flag, hint_hash = entry
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            elif flag == UPPER:
+                beta = min(beta, value)
+            if flag == EXACT or beta <= alpha:
+                self.transposition_table.cutoffs += 1
+                return value, None
+        elif stats is not None:
+            stats.cache_misses += 1
+        if stats is not None:
+            stats.enter(len(position.history))
+        maximize = len(position.history) % 2 == 0
+        actions = self.move_ordering.order(position, position.get_valid_actions(), hint_hash)
+        # [actions, index of the next action, alpha, beta, original alpha, original beta, best value, hash after the
+        #  best move, hash, maximize]
+        return None, [actions, 0, alpha, beta, original_alpha, original_beta, -math.inf if maximize else math.inf,
+                      None, zobrist_hash, maximize]
+
+    def alpha_beta(self, position, alpha=-math.inf, beta=math.inf):
+        """ Value of position as q2.alpha_beta_pruning computes it. The position is restored before returning.
+
+        :param position: NotaktoPosition
+        :return: int, 1 if player 1 wins, -1 if player 2 wins
+        """
+        stats = search_profiler.collector
+        value, frame = self._probe(position, alpha, beta)
+        if frame is None:
+            return value
+        stack = [frame]
+        while True:
+            frame = stack[-1]
+            actions, index = frame[0], frame[1]
+            if value is not None:
+                # the value of the child reached by actions[index - 1] came back
+                action = actions[index - 1]
+                child_hash = position.zobrist_hash
+                position.unmake(action)
+                if value > frame[6] if frame[9] else value < frame[6]:
+                    frame[6] = value
+                    frame[7] = child_hash
+                if frame[9]:
+                    frame[2] = max(frame[2], frame[6])
+                else:
+                    frame[3] = min(frame[3], frame[6])
+                if frame[3] <= frame[2]:
+                    self.move_ordering.cutoff(position, action)
+                    if stats is not None:
+                        stats.cutoff(index - 1)
+                    index = len(actions)
+            if index < len(actions):
+                frame[1] = index + 1
+                position.make(actions[index])
+                value, child_frame = self._probe(position, frame[2], frame[3])
+                if child_frame is not None:
+                    stack.append(child_frame)
+                continue
+
+            # every child is searched or one caused a cutoff
+            best_val = frame[6]
+            if best_val <= frame[4]:
+                flag = UPPER
+            elif best_val >= frame[5]:
+                flag = LOWER
+            else:
+                flag = EXACT
+            if (flag == LOWER and best_val >= 1) or (flag == UPPER and best_val <= -1):
+                flag = EXACT
+            self.transposition_table.store(frame[8], best_val, flag, 9 * position.num_boards - len(position.history),
+                                           frame[7])
+            if stats is not None:
+                stats.cache_stores += 1
+                stats.exit(len(position.history))
+            stack.pop()
+            if not stack:
+                return best_val
+            value = best_val
+
+    def maxmin(self, position):
+        """ Value of position as q2.maxmin computes it, caching every position by its canonical key in self.values.
+        The position is restored before returning.
+
+        :param position: NotaktoPosition
+        :return: int, 1 if player 1 wins, -1 if player 2 wins
+        """
+        stats = search_profiler.collector
+        stack = []
+        value = None
+        while True:
+            if value is None:
+                # entering position
+                self.visited += 1
+                if position.live_boards == 0:
+                    if stats is not None:
+                        stats.terminal_hits += 1
+                    value = position.get_value_given_terminal_history()
+                else:
+                    key = position.get_canonical_key()
+                    value = self.values.get(key)
+                    if value is not None:
+                        if stats is not None:
+                            stats.cache_hits += 1
+                    else:
+                        if stats is not None:
+                            stats.cache_misses += 1
+                            stats.enter(len(position.history))
+                        maximize = len(position.history) % 2 == 0
+                        # [actions, index of the next action, best value, key, maximize]
+                        stack.append([position.get_valid_actions(), 0, -math.inf if maximize else math.inf, key,
+                                      maximize])
+                if value is not None and not stack:
+                    return value
+
+            frame = stack[-1]
+            actions, index = frame[0], frame[1]
+            if value is not None:
+                position.unmake(actions[index - 1])
+                frame[2] = max(frame[2], value) if frame[4] else min(frame[2], value)
+            if index < len(actions):
+                frame[1] = index + 1
+                position.make(actions[index])
+                value = None
+                continue
+            self.values[frame[3]] = frame[2]
+            if stats is not None:
+                stats.cache_stores += 1
+                stats.exit(len(position.history))
+            stack.pop()
+            value = frame[2]
+            if not stack:
+                return value
+
+
+def compare(num_boards):
+    """ Solve the empty game of num_boards boards with the recursive functions of q2 and with SearchEngine, and log
+    values, visited counts and nodes per second of each.
+
+    :return: dict of the results
+    """
+    result = {'num_boards': num_boards}
+
+    q2.transposition_table.clear()
+    q2.move_ordering = MOVE_ORDERINGS['hint']
+    q2.move_ordering.clear()
+    q2.visited_histories_list = []
+    start = time.perf_counter()
+    result['recursive_alpha_beta'] = q2.alpha_beta_pruning(History(history=[], num_boards=num_boards), -math.inf,
+                                                           math.inf, True)
+    result['recursive_alpha_beta_seconds'] = time.perf_counter() - start
+    result['recursive_alpha_beta_visited'] = len(q2.visited_histories_list)
+    q2.visited_histories_list = []
+    q2.transposition_table.clear()
+
+    engine = SearchEngine()
+    engine.move_ordering.clear()
+    start = time.perf_counter()
+    result['alpha_beta'] = engine.alpha_beta(NotaktoPosition(num_boards))
+    result['alpha_beta_seconds'] = time.perf_counter() - start
+    result['alpha_beta_visited'] = engine.visited
+
+    # maxmin keeps no visited list; the profiler counts its calls
+    q2.board_positions_val_dict.clear()
+    search_profiler.enable()
+    start = time.perf_counter()
+    result['recursive_maxmin'] = q2.maxmin(History(history=[], num_boards=num_boards), True)
+    result['recursive_maxmin_seconds'] = time.perf_counter() - start
+    summary = search_profiler.disable()
+    result['recursive_maxmin_visited'] = summary['terminal_hits'] + summary['cache_hits'] + summary['cache_misses']
+    q2.board_positions_val_dict.clear()
+
+    engine = SearchEngine()
+    start = time.perf_counter()
+    result['maxmin'] = engine.maxmin(NotaktoPosition(num_boards))
+    result['maxmin_seconds'] = time.perf_counter() - start
+    result['maxmin_visited'] = engine.visited
+
+    for search in ('alpha_beta', 'maxmin'):
+        recursive = 'recursive_' + search
+        logging.info("{} boards, {}: value {} / {}, visited {} / {}, {:.0f} / {:.0f} nodes/s (recursive / engine), "
+                     "{:.1f}x".format(num_boards, search, result[recursive], result[search],
+                                      result[recursive + '_visited'], result[search + '_visited'],
+                                      result[recursive + '_visited'] / result[recursive + '_seconds'],
+                                      result[search + '_visited'] / result[search + '_seconds'],
+                                      result[recursive + '_seconds'] / result[search + '_seconds']))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-boards', type=int, nargs='+', default=[2, 3])
+    arguments = parser.parse_args()
+    for num_boards in arguments.num_boards:
+        compare(num_boards)
@@ -0,0 +1,184 @@
+import argparse
+import logging
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+
+import q2
+from notakto_engine import NotaktoPosition, SearchEngine
+from q2 import EXACT, TranspositionTable
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+DEFAULT_SHARED_SLOTS = 1 << 20
+# Shared table slot layout (one uint64): the Zobrist hash with its two low bits replaced by OCCUPIED and the value bit
+OCCUPIED = 2
+WINS = 1  # set when the value is 1 (player 1 wins), clear when it is -1
+
+# Per-process state of the pool workers, set by _init_worker
+_worker = {}
+
+
+class SharedTable:
+    """ Hash table of exact Notakto values in shared memory, one 64-bit slot per entry so that a slot is written and
+    read in one piece: the 62 high bits of the hash identify the position, the low bits hold the value. Entries are
+    only ever exact values, which hold in any search window, so processes can use each other's results unchecked.
+    A later position mapping to the same slot replaces the earlier one.
+    """
+
+    def __init__(self, slots=DEFAULT_SHARED_SLOTS, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=8 * slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.slots = self.shm.buf.cast('Q')
+        self.num_slots = len(self.slots)
+
+    def probe(self, zobrist_hash):
+        # exact value stored for the hash, or None
+        slot = self.slots[zobrist_hash % self.num_slots]
+        if slot & OCCUPIED and (slot ^ zobrist_hash) >> 2 == 0:
+            return 1 if slot & WINS else -1
+        return None
+
+    def publish(self, zobrist_hash, value):
+        self.slots[zobrist_hash % self.num_slots] = zobrist_hash >> 2 << 2 | OCCUPIED | (WINS if value > 0 else 0)
+
+    def close(self):
+        self.slots.release()
+        self.shm.close()
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """ The private transposition table of one process, backed by a SharedTable: probes that miss the private table
+    are answered from the shared one, and exact results are published to it.
+    """
+
+    def __init__(self, shared_table, capacity=q2.DEFAULT_TABLE_SIZE):
+        self.shared_table = shared_table
+        super().__init__(capacity)
+
+    def clear(self):
+        super().clear()
+        self.shared_hits = 0
+
+    def probe(self, zobrist_hash):
+        entry = super().probe(zobrist_hash)
+        if entry is None:
+            value = self.shared_table.probe(zobrist_hash)
+            if value is not None:
+                self.shared_hits += 1
+                return value, EXACT, None
+        return entry
+
+    def store(self, zobrist_hash, value, flag, depth, best_hash=None):
+        super().store(zobrist_hash, value, flag, depth, best_hash)
+        if flag == EXACT:
+            self.shared_table.publish(zobrist_hash, value)
+
+
+def _shared_engine(shared_table):
+    engine = SearchEngine()
+    engine.transposition_table = SharedTranspositionTable(shared_table)
+    engine.move_ordering.clear()
+    return engine
+
+
+def _init_worker(shared_name):
+    _worker['shared_table'] = SharedTable(name=shared_name)
+    _worker['engine'] = _shared_engine(_worker['shared_table'])
+
+
+def _search_move(task):
+    # (num_boards, history, alpha, beta) -> (value, nodes visited) of the position after history
+    num_boards, history, alpha, beta = task
+    engine = _worker['engine']
+    visited = engine.visited
+    value = engine.alpha_beta(NotaktoPosition(num_boards, history), alpha, beta)
+    return value, engine.visited - visited
+
+
+def parallel_alpha_beta(num_boards, history=None, workers=None, shared_slots=DEFAULT_SHARED_SLOTS):
+    """ Alpha beta value of the position after history, with the moves at the root split across a process pool.
+
+    The first move (in move ordering) is searched fully before its siblings, which then run in parallel with the
+    window it established (Young Brothers Wait). Root moves leading to the same canonical position are searched once.
+    Every process publishes the exact values it finds to one SharedTable, which the others read.
+
+    :return: (value, total nodes visited by all processes)
+    """
+    workers = workers or os.cpu_count() or 1
+    shared_table = SharedTable(shared_slots)
+    try:
+        engine = _shared_engine(shared_table)
+        position = NotaktoPosition(num_boards, history)
+        if position.is_win():
+            return position.get_value_given_terminal_history(), 1
+        maximize = len(position.history) % 2 == 0
+        moves = []
+        seen = set()
+        for action in engine.move_ordering.order(position, position.get_valid_actions()):
+            child_hash = position.get_zobrist_hash_after(action)
+            if child_hash not in seen:
+                seen.add(child_hash)
+                moves.append(action)
+
+        # eldest brother first, in this process
+        position.make(moves[0])
+        best_val = engine.alpha_beta(position, -math.inf, math.inf)
+        position.unmake(moves[0])
+        visited = 1 + engine.visited
+        if best_val == (1 if maximize else -1) or len(moves) == 1:
+            return best_val, visited
+
+        alpha, beta = (best_val, math.inf) if maximize else (-math.inf, best_val)
+        tasks = [(num_boards, position.history + [action], alpha, beta) for action in moves[1:]]
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(shared_table.shm.name,)) as pool:
+            for value, child_visited in pool.imap_unordered(_search_move, tasks):
+                visited += child_visited
+                best_val = max(best_val, value) if maximize else min(best_val, value)
+                if best_val == (1 if maximize else -1):
+                    # a winning move for the player at the root: the other siblings cannot change the value
+                    pool.terminate()
+                    break
+        return best_val, visited
+    finally:
+        shared_table.close()
+        shared_table.shm.unlink()
+
+
+def compare(num_boards, worker_counts):
+    """ Log the time and nodes of the serial search (SearchEngine.alpha_beta) and of parallel_alpha_beta for each
+    number of workers, with the speed-up and the search overhead (extra nodes visited) of the parallel one.
+    """
+    engine = SearchEngine()
+    engine.move_ordering.clear()
+    start = time.perf_counter()
+    serial_value = engine.alpha_beta(NotaktoPosition(num_boards))
+    serial_seconds = time.perf_counter() - start
+    logging.info("{} boards, serial: value {}, {} nodes, {:.2f}s".format(
+        num_boards, serial_value, engine.visited, serial_seconds))
+    for workers in worker_counts:
+        start = time.perf_counter()
+        value, visited = parallel_alpha_beta(num_boards, workers=workers)
+        seconds = time.perf_counter() - start
+        if value != serial_value:
+            raise AssertionError('parallel value {} != serial value {}'.format(value, serial_value))
+        logging.info("{} boards, {} workers: value {}, {} nodes, {:.2f}s, speed-up {:.2f}x, search overhead {:+.1%}"
+                     .format(num_boards, workers, value, visited, seconds, serial_seconds / seconds,
+                             visited / engine.visited - 1))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-boards', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='numbers of worker processes, defaults to powers of two up to the number of cores')
+    arguments = parser.parse_args()
+    cores = os.cpu_count() or 1
+    worker_counts = arguments.workers or [2 ** i for i in range(cores.bit_length()) if 2 ** i <= cores]
+    for num_boards in arguments.num_boards:
+        compare(num_boards, worker_counts)
@@ -1,8 +1,9 @@
 import pygame
 import random
-import json
 import argparse
 
+from policy_store import load_policy
+
 
 def draw_cross(x_pos, y_pos, s):
     global screen
@@ -245,7 +246,8 @@ def move_action(event, last_click_time, square, surface):
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--BotPlayer', type=str, required=True, help='x or o')
-parser.add_argument('--BotStrategyFile', type=str, required=True, help='json file containing strategy')
+parser.add_argument('--BotStrategyFile', type=str, required=True,
+                    help='json or binary (see policy_store.py) file containing strategy')
 arguments = parser.parse_args()
 
 # pygame setup
@@ -290,7 +292,7 @@ board_index_to_coordinates_map = {0: (100, 100), 1: (200, 100), 2: (300, 100),
                                   3: (100, 200), 4: (200, 200), 5: (300, 200),
                                   6: (100, 300), 7: (200, 300), 8: (300, 300)}
 
-policy = json.load(open(strategy_file_name, 'r'))
+policy = load_policy(strategy_file_name)
 
 # game loop
 while running:
@@ -340,7 +342,7 @@ while running:
     elif not game_over:
         if use_policy and not turn:
             board_str = ''.join([str(act) for act in game_history])
-            if board_str not in policy.keys():
+            if board_str not in policy:
                 print('Error: You policy does not contain history', board_str)
                 exit(1)
             available_plays = policy[board_str]
@@ -0,0 +1,201 @@
+import argparse
+import functools
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import q1
+from policy_store import load_policy
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_SIZE = 65536
+
+
+class PolicyService:
+    """ Answers "history -> action distribution" queries from a policy produced by q1.solve_tictactoe (JSON or binary,
+    see policy_store.py). Histories missing from the policy are solved live with q1's solver. An LRU cache sits in
+    front of both.
+    """
+
+    def __init__(self, policy_file, cache_size=DEFAULT_CACHE_SIZE):
+        self.policy = load_policy(policy_file)
+        self.solver_lock = threading.Lock()
+        self.lookup = functools.lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, history):
+        # (distribution, source) for a q1 history str; raises ValueError for histories that are not legal
+        # non-terminal tic-tac-toe positions
+        distribution = self.policy.get(history)
+        if distribution is not None:
+            return distribution, 'policy'
+        actions = [int(action) for action in history]
+        if len(set(actions)) != len(actions) or any(action > 8 for action in actions):
+            raise ValueError('not a legal history: {!r}'.format(history))
+        position = q1.Position()
+        for action in actions:
+            if position.is_terminal():
+                raise ValueError('history {!r} continues after the end of the game'.format(history))
+            position.make(action)
+        if position.is_terminal():
+            raise ValueError('history {!r} is a terminal history'.format(history))
+        with self.solver_lock:
+            move = q1.best_action(position)
+        distribution = {str(action): 0 for action in range(9)}
+        distribution[str(move)] = 1
+        return distribution, 'solver'
+
+    def query(self, history):
+        try:
+            distribution, source = self.lookup(history)
+        except ValueError as e:
+            return {'history': history, 'error': str(e)}
+        return {'history': history, 'distribution': distribution, 'source': source}
+
+
+class PolicyRequestHandler(BaseHTTPRequestHandler):
+    """ GET /policy?history=0425 answers one history, POST /batch with {"histories": [...]} answers many in one round
+    trip. Responses are JSON; connections are kept alive between requests.
+    """
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes; with Nagle on, the body waits for the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    service = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != '/policy':
+            self._send_json(404, {'error': 'unknown path {}'.format(url.path)})
+            return
+        result = self.service.query(parse_qs(url.query, keep_blank_values=True).get('history', [''])[0])
+        self._send_json(400 if 'error' in result else 200, result)
+
+    def do_POST(self):
+        if self.path != '/batch':
+            self._send_json(404, {'error': 'unknown path {}'.format(self.path)})
+            return
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            histories = request['histories']
+        except (ValueError, KeyError, TypeError):
+            self._send_json(400, {'error': 'expected {"histories": [...]}'})
+            return
+        self._send_json(200, {'results': [self.service.query(str(history)) for history in histories]})
+
+    def log_message(self, format, *args):
+        # one log line per request would dominate the cost of a lookup
+        pass
+
+
+def serve(policy_file, host='127.0.0.1', port=DEFAULT_PORT, cache_size=DEFAULT_CACHE_SIZE):
+    handler = type('Handler', (PolicyRequestHandler,), {'service': PolicyService(policy_file, cache_size)})
+    server = ThreadingHTTPServer((host, port), handler)
+    logging.info("Serving {} on http://{}:{}".format(policy_file, host, server.server_port))
+    return server
+
+
+def random_histories(count, seed=0):
+    # random legal non-terminal tic-tac-toe histories, as q1 str keys
+    rng = random.Random(seed)
+    histories = []
+    while len(histories) < count:
+        squares = list(range(9))
+        rng.shuffle(squares)
+        position = q1.Position()
+        history = ''
+        for square in squares[:rng.randint(0, 8)]:
+            position.make(square)
+            if position.is_terminal():
+                break
+            history += str(square)
+        histories.append(history)
+    return histories
+
+
+def generate_load(host='127.0.0.1', port=DEFAULT_PORT, clients=4, requests=10000, batch_size=1, seed=0):
+    """ Send `requests` queries from `clients` threads, each over one kept-alive connection, `batch_size` histories
+    per request (1 uses GET /policy, more use POST /batch).
+
+    :return: dict with queries, seconds, queries_per_second and p50/p99 request latency in milliseconds
+    """
+    histories = random_histories(1000, seed)
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index, num_requests):
+        rng = random.Random(seed + index)
+        connection = http.client.HTTPConnection(host, port)
+        own_latencies = []
+        for _ in range(num_requests):
+            start = time.perf_counter()
+            if batch_size == 1:
+                connection.request('GET', '/policy?history=' + rng.choice(histories))
+            else:
+                body = json.dumps({'histories': [rng.choice(histories) for _ in range(batch_size)]})
+                connection.request('POST', '/batch', body, {'Content-Type': 'application/json'})
+            connection.getresponse().read()
+            own_latencies.append(time.perf_counter() - start)
+        connection.close()
+        with lock:
+            latencies.extend(own_latencies)
+
+    threads = [threading.Thread(target=client, args=(i, requests // clients + (i < requests % clients)))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'queries': len(latencies) * batch_size,
+        'seconds': elapsed,
+        'queries_per_second': len(latencies) * batch_size / elapsed,
+        'p50_ms': 1000 * latencies[len(latencies) // 2],
+        'p99_ms': 1000 * latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='serve a policy file')
+    serve_parser.add_argument('policy', type=str, help='policy_x/policy_o file from q1 (json or binary)')
+    serve_parser.add_argument('--host', type=str, default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve_parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_SIZE)
+    load_parser = subparsers.add_parser('loadgen', help='measure a running server')
+    load_parser.add_argument('--host', type=str, default='127.0.0.1')
+    load_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    load_parser.add_argument('--clients', type=int, default=4)
+    load_parser.add_argument('--requests', type=int, default=10000)
+    load_parser.add_argument('--batch-size', type=int, default=1)
+    arguments = parser.parse_args()
+
+    if arguments.command == 'serve':
+        server = serve(arguments.policy, arguments.host, arguments.port, arguments.cache_size)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
+    else:
+        stats = generate_load(arguments.host, arguments.port, arguments.clients, arguments.requests,
+                              arguments.batch_size)
+        logging.info("{queries} queries in {seconds:.2f}s: {queries_per_second:.0f} queries/s, "
+                     "p50 {p50_ms:.2f} ms, p99 {p99_ms:.2f} ms per request".format(**stats))
@@ -0,0 +1,157 @@
+import argparse
+import json
+import mmap
+import struct
+
+# Binary policy file layout (little endian):
+#   header      MAGIC, number of entries (uint32), number of actions (uint16), key width (uint16), encoding (uint8)
+#   keys        one record of `key width` bytes per history, sorted: the actions of the history, one byte each,
+#               padded with KEY_PADDING
+#   values      in key order, ENCODING_ACTION: one byte per history, the action played with probability 1;
+#               ENCODING_FLOAT32: `number of actions` float32 probabilities per history
+# Histories are looked up by binary search over the keys of the memory-mapped file, so opening a policy reads
+# nothing but the header, whatever its size.
+MAGIC = b'POLICY1\0'
+HEADER = struct.Struct('<8sIHHB')
+KEY_PADDING = 0xFF
+ENCODING_ACTION = 0
+ENCODING_FLOAT32 = 1
+
+
+def history_to_actions(history):
+    # q1 keys are str with one digit per action ("0425"), keys of larger boards (mnk.MNKGame.move_key) end every action
+    # with a comma ("1,10,"); lists/tuples of ints are taken as they are
+    if isinstance(history, str):
+        if ',' in history:
+            return [int(action) for action in history.split(',') if action]
+        return [int(action) for action in history]
+    return list(history)
+
+
+def write_policy(path, policy, num_actions=9):
+    """ Write a policy in the binary format.
+
+    :param policy: mapping from history (q1 str key or sequence of ints) to a dict from action (str) to probability,
+                   like q1.strategy_dict_x
+    :param num_actions: number of actions of the game (9 for tic-tac-toe)
+    """
+    if num_actions > KEY_PADDING:
+        raise ValueError('at most {} actions fit in one byte'.format(KEY_PADDING))
+    entries = []
+    key_width = 1
+    for history, distribution in policy.items():
+        actions = history_to_actions(history)
+        key_width = max(key_width, len(actions))
+        probabilities = [0.0] * num_actions
+        for action, probability in distribution.items():
+            probabilities[int(action)] = probability
+        entries.append((actions, probabilities))
+    deterministic = all(sorted(probabilities)[-1] == 1 and sum(probabilities) == 1 for _, probabilities in entries)
+
+    records = sorted((bytes(actions) + bytes([KEY_PADDING]) * (key_width - len(actions)), probabilities)
+                     for actions, probabilities in entries)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(records), num_actions, key_width,
+                            ENCODING_ACTION if deterministic else ENCODING_FLOAT32))
+        for key, _ in records:
+            f.write(key)
+        if deterministic:
+            f.write(bytes(probabilities.index(1) for _, probabilities in records))
+        else:
+            row = struct.Struct('<{}f'.format(num_actions))
+            for _, probabilities in records:
+                f.write(row.pack(*probabilities))
+
+
+class PolicyFile:
+    """ Read-only, memory-mapped view of a binary policy file with the lookups of a dict of q1 strategies:
+    policy[history], policy.get(history) and `history in policy`, history given as a q1 str key or a sequence of ints.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_entries, self.num_actions, self.key_width, self.encoding = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError('{} is not a binary policy file'.format(path))
+        self._keys_offset = HEADER.size
+        self._values_offset = self._keys_offset + self.num_entries * self.key_width
+        self._row = struct.Struct('<{}f'.format(self.num_actions))
+
+    def _find(self, history):
+        # index of the history in the sorted keys, or -1
+        actions = history_to_actions(history)
+        if len(actions) > self.key_width or any(action >= KEY_PADDING for action in actions):
+            return -1
+        key = bytes(actions) + bytes([KEY_PADDING]) * (self.key_width - len(actions))
+        low, high = 0, self.num_entries
+        while low < high:
+            middle = (low + high) // 2
+            offset = self._keys_offset + middle * self.key_width
+            if self._mmap[offset:offset + self.key_width] < key:
+                low = middle + 1
+            else:
+                high = middle
+        offset = self._keys_offset + low * self.key_width
+        if low < self.num_entries and self._mmap[offset:offset + self.key_width] == key:
+            return low
+        return -1
+
+    def get(self, history, default=None):
+        index = self._find(history)
+        if index < 0:
+            return default
+        if self.encoding == ENCODING_ACTION:
+            action = self._mmap[self._values_offset + index]
+            return {str(a): (1 if a == action else 0) for a in range(self.num_actions)}
+        probabilities = self._row.unpack_from(self._mmap, self._values_offset + index * self._row.size)
+        return {str(a): probability for a, probability in enumerate(probabilities)}
+
+    def __getitem__(self, history):
+        distribution = self.get(history)
+        if distribution is None:
+            raise KeyError(history)
+        return distribution
+
+    def __contains__(self, history):
+        return self._find(history) >= 0
+
+    def __len__(self):
+        return self.num_entries
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_binary_policy(path):
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load_policy(path):
+    # PolicyFile for binary policies, the decoded dict for JSON ones
+    if is_binary_policy(path):
+        return PolicyFile(path)
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def convert_json_policy(json_path, binary_path, num_actions=9):
+    with open(json_path, 'r') as f:
+        write_policy(binary_path, json.load(f), num_actions)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert a JSON policy (e.g. policy_x.json from q1) to the binary '
+                                                 'format')
+    parser.add_argument('json_policy', type=str)
+    parser.add_argument('binary_policy', type=str)
+    parser.add_argument('--num-actions', type=int, default=9)
+    arguments = parser.parse_args()
+    convert_json_policy(arguments.json_policy, arguments.binary_policy, arguments.num_actions)
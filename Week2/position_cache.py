@@ -0,0 +1,143 @@
+import argparse
+import logging
+import os
+import sqlite3
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+# Bump when the rules of the game or the meaning of keys or values change: a cache file written under other rules is
+# emptied when it is opened
+RULES = 'notakto 3x3 misere; key: parity of moves played and sorted canonical masks of live boards; value: maxmin'
+FORMAT_VERSION = 1
+DEFAULT_MAX_ENTRIES = 1 << 20
+# Pending writes are flushed to the file in one transaction when there are this many of them
+FLUSH_SIZE = 1 << 14
+
+
+def encode_key(key):
+    # History.get_canonical_key() -> text column
+    parity, live_boards = key
+    return '{}:{}'.format(parity, ','.join(map(str, live_boards)))
+
+
+class PositionCache:
+    """ Exact values of Notakto positions, keyed by History.get_canonical_key(), kept in an SQLite file across runs.
+
+    Reads go through an in-memory dict to the file, one indexed query per position not seen yet in the run (none at
+    all while the file holds nothing for num_boards). Writes are buffered and flushed in one transaction. Entries are
+    namespaced by num_boards, and the whole file is emptied when it was written under other RULES or FORMAT_VERSION.
+
+    The file holds at most max_entries positions. Every open starts a new generation, and positions read or written
+    are marked with it; when a flush goes over the cap, the positions of the oldest generations are evicted first and,
+    within a generation, the ones written first, which are the deepest ones (searches store a position after its
+    children), so the cheapest to solve again.
+    """
+
+    def __init__(self, path, num_boards, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.num_boards = num_boards
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._values = {}
+        self._pending = {}
+        self._touched = set()
+        self._connection = sqlite3.connect(path)
+        self._connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        meta = dict(self._connection.execute('SELECT name, value FROM meta'))
+        if meta.get('rules') != RULES or meta.get('format') != str(FORMAT_VERSION):
+            if meta:
+                logging.info("{} was written under other rules, emptying it".format(path))
+            self._connection.execute('DROP TABLE IF EXISTS positions')
+            meta = {'rules': RULES, 'format': str(FORMAT_VERSION), 'generation': '0'}
+        self._connection.execute('CREATE TABLE IF NOT EXISTS positions (num_boards INTEGER, key TEXT, value INTEGER, '
+                                 'generation INTEGER, PRIMARY KEY (num_boards, key))')
+        self._connection.execute('CREATE INDEX IF NOT EXISTS positions_age ON positions (generation)')
+        self.generation = int(meta['generation']) + 1
+        meta['generation'] = str(self.generation)
+        self._connection.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', meta.items())
+        self._connection.commit()
+        self._stored = self._connection.execute('SELECT COUNT(*) FROM positions WHERE num_boards = ?',
+                                                (num_boards,)).fetchone()[0]
+
+    def get(self, key):
+        """ Exact value of the position with canonical key key, or None. """
+        if key in self._values:
+            value = self._values[key]
+        elif not self._stored:
+            value = None
+        else:
+            text = encode_key(key)
+            row = self._connection.execute('SELECT value FROM positions WHERE num_boards = ? AND key = ?',
+                                           (self.num_boards, text)).fetchone()
+            value = row[0] if row is not None else None
+            self._values[key] = value
+            if value is not None:
+                self._touched.add(text)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """ Record the exact value of the position with canonical key key. """
+        if self._values.get(key) == value:
+            return
+        self._values[key] = value
+        self._pending[encode_key(key)] = value
+        if len(self._pending) >= FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        connection = self._connection
+        with connection:
+            connection.executemany('INSERT OR REPLACE INTO positions VALUES (?, ?, ?, ?)',
+                                   [(self.num_boards, text, value, self.generation)
+                                    for text, value in self._pending.items()])
+            connection.executemany('UPDATE positions SET generation = ? WHERE num_boards = ? AND key = ?',
+                                   [(self.generation, self.num_boards, text) for text in self._touched])
+            self._pending.clear()
+            self._touched.clear()
+            excess = connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0] - self.max_entries
+            if excess > 0:
+                # evicted positions may still be in self._values; they are only dropped from the file
+                connection.execute('DELETE FROM positions WHERE rowid IN '
+                                   '(SELECT rowid FROM positions ORDER BY generation, rowid LIMIT ?)', (excess,))
+                self.evicted += excess
+            self._stored = connection.execute('SELECT COUNT(*) FROM positions WHERE num_boards = ?',
+                                              (self.num_boards,)).fetchone()[0]
+
+    def close(self):
+        if self._connection is None:
+            return
+        self.flush()
+        self._connection.close()
+        self._connection = None
+
+    def __len__(self):
+        # positions of num_boards in the file, after writing the pending ones (some of which may replace stored ones)
+        if self._pending and self._connection is not None:
+            self.flush()
+        return self._stored
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Print the number of positions of each number of boards in a cache')
+    parser.add_argument('cache', type=str)
+    arguments = parser.parse_args()
+    if not os.path.exists(arguments.cache):
+        raise SystemExit('{} does not exist'.format(arguments.cache))
+    connection = sqlite3.connect(arguments.cache)
+    for num_boards, count, generation in connection.execute(
+            'SELECT num_boards, COUNT(*), MAX(generation) FROM positions GROUP BY num_boards ORDER BY num_boards'):
+        logging.info("{} boards: {} positions, last used in generation {}".format(num_boards, count, generation))
+    connection.close()
@@ -1,7 +1,10 @@
+import argparse
 import json
-import copy  # use it for deepcopy if needed
-import math  # for math.inf
 import logging
+import time
+
+import search_profiler
+from policy_store import write_policy
 
 logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
                     level=logging.INFO)
@@ -11,6 +14,110 @@ logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt=
 strategy_dict_x = {}
 strategy_dict_o = {}
 
+# Transposition table: canonical key (see Position.canonical_key) -> utility of the position under optimal play.
+# Positions reached by different move orders or equal up to a rotation/reflection of the board share one entry.
+transposition_table = {}
+# Position.key() -> best action, so that every history with the same board reuses one decision
+best_action_cache = {}
+# Counters reported by solve_tictactoe
+search_stats = {'node_expansions': 0, 'histories': 0}
+
+# The 8 symmetries of the board (rotations and reflections) as permutations: square i of the transformed board is
+# square SYMMETRIES[k][i] of the original one.
+SYMMETRIES = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],  # identity
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],  # rotate 90
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],  # rotate 180
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],  # rotate 270
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],  # mirror left-right
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],  # mirror top-bottom
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],  # mirror main diagonal
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],  # mirror anti-diagonal
+]
+
+# Bitboards: bit i of a 9-bit mask is square i
+FULL_BOARD = 0b111111111
+WIN_MASKS = [0b000000111, 0b000111000, 0b111000000,  # rows
+             0b001001001, 0b010010010, 0b100100100,  # columns
+             0b100010001, 0b001010100]  # diagonals
+# HAS_LINE[mask] is True when the squares in mask contain a complete line
+HAS_LINE = [any(mask & win_mask == win_mask for win_mask in WIN_MASKS) for mask in range(FULL_BOARD + 1)]
+# SQUARES[mask] lists the squares in mask in increasing order
+SQUARES = [[i for i in range(9) if mask >> i & 1] for mask in range(FULL_BOARD + 1)]
+# SYMMETRY_MASKS[k][mask] is mask transformed by SYMMETRIES[k]
+SYMMETRY_MASKS = [
+    [sum(1 << i for i in range(9) if mask >> symmetry[i] & 1) for mask in range(FULL_BOARD + 1)]
+    for symmetry in SYMMETRIES
+]
+
+
+class Position:
+    """ Compact board used by the solver: the squares of each player as a 9-bit integer.
+
+    Moves are made and unmade in place, so a search walks the game tree with a single Position and no list copies.
+    """
+    __slots__ = ('x', 'o', 'num_moves')
+
+    def __init__(self, x=0, o=0, num_moves=0):
+        self.x = x
+        self.o = o
+        self.num_moves = num_moves
+
+    @classmethod
+    def from_history(cls, history):
+        position = cls()
+        for action in history:
+            position.make(action)
+        return position
+
+    def player(self):
+        return 'x' if self.num_moves % 2 == 0 else 'o'
+
+    def make(self, square):
+        if self.num_moves & 1:
+            self.o |= 1 << square
+        else:
+            self.x |= 1 << square
+        self.num_moves += 1
+
+    def unmake(self, square):
+        self.num_moves -= 1
+        if self.num_moves & 1:
+            self.o &= ~(1 << square)
+        else:
+            self.x &= ~(1 << square)
+
+    def winner(self):
+        if HAS_LINE[self.x]:
+            return 'x'
+        if HAS_LINE[self.o]:
+            return 'o'
+        return None
+
+    def is_terminal(self):
+        return HAS_LINE[self.x] or HAS_LINE[self.o] or (self.x | self.o) == FULL_BOARD
+
+    def utility(self):
+        # utility of a terminal position: 1 if 'x' won, -1 if 'o' won, 0.0 for a draw
+        if HAS_LINE[self.x]:
+            return 1
+        if HAS_LINE[self.o]:
+            return -1
+        return 0.0
+
+    def legal_moves(self):
+        return SQUARES[~(self.x | self.o) & FULL_BOARD]
+
+    def key(self):
+        return self.x << 9 | self.o
+
+    def canonical_key(self):
+        """ Smallest key among the 8 symmetric variants of the board. The player to move follows from the number of
+        marks, so this identifies the position completely.
+        """
+        x, o = self.x, self.o
+        return min(symmetry_masks[x] << 9 | symmetry_masks[o] for symmetry_masks in SYMMETRY_MASKS)
+
 
 class History:
     def __init__(self, history=None):
@@ -45,6 +152,8 @@ class History:
             self.history = []
             self.board = ['0', '0', '0', '0', '0', '0', '0', '0', '0']
         self.player = self.current_player()
+        # Bitboard of the same position; the game-state checks below are answered from it
+        self.position = Position.from_history(self.history)
 
     def current_player(self):
         """ Player function
@@ -77,64 +186,26 @@ class History:
     def is_win(self):
         # check if the board position is a win for either players
         # Feel free to implement this in anyway if needed
-        board = self.board
-        if board[0] == board[1] and board[2] == board[1]:
-            if board[0] != '0':
-                return board[0] 
-        if board[3] == board[4] and board[5] == board[4]:
-            if board[3] != '0':
-                return board[3] 
-        if board[6] == board[7] and board[8] == board[7]:
-            if board[6] != '0':
-                return board[6] 
-        if board[0] == board[3] and board[6] == board[3]:
-            if board[0] != '0':
-                return board[0] 
-        if board[1] == board[4] and board[7] == board[4]:
-            if board[1] != '0':
-                return board[1] 
-        if board[2] == board[5] and board[8] == board[5]:
-            if board[2] != '0':
-                return board[2] 
-        if board[0] == board[4] and board[8] == board[4]:
-            if board[0] != '0':
-                return board[0] 
-        if board[2] == board[4] and board[6] == board[4]:
-            if board[2] != '0':
-                return board[2] 
-        return False
+        return self.position.winner() or False
 
     def is_draw(self):
         # check if the board position is a draw
         # Feel free to implement this in anyway if needed
-        if '0' not in self.board and not self.is_win():
-            return True
-        return False
+        return self.position.is_terminal() and not self.position.winner()
 
     def get_valid_actions(self):
         # get the empty squares from the board
         # Feel free to implement this in anyway if needed
-        valid_actions = []
-        for i in range(len(self.board)):
-            if self.board[i] == '0':
-                valid_actions.append(i)
-        return valid_actions
+        return list(self.position.legal_moves())
 
     def is_terminal_history(self):
         # check if the history is a terminal history
         # Feel free to implement this in anyway if needed
-        if self.is_win() or self.is_draw():
-            return True
-        return False
+        return self.position.is_terminal()
 
     def get_utility_given_terminal_history(self):
         # Feel free to implement this in anyway if needed
-        if self.is_win() == 'x':
-            return 1
-        elif self.is_win() == 'o':
-            return -1
-        elif self.is_draw():
-            return 0.0
+        return self.position.utility()
 
     """
     what is deepcopy?
@@ -143,9 +214,8 @@ class History:
     def update_history(self, action):
         # In case you need to create a deepcopy and update the history obj to get the next history object.
         # Feel free to implement this in anyway if needed
-        new_history = copy.deepcopy(self.history)
-        new_history.append(action)
-        return new_history
+        # The history only holds ints, so a shallow copy is as good as a deepcopy
+        return self.history + [action]
     
     def stringify(self):
         """ Stringify the history object for easy comparison and storage in dictionaries.
@@ -154,13 +224,83 @@ class History:
         return ''.join(map(str, self.history))
 
 
+def solve_position(position):
+    """ Utility of a Position under optimal play (1 if 'x' wins, -1 if 'o' wins, 0 for a draw).
+
+    Every position is expanded once: results are stored in transposition_table under the canonical key, so other move
+    orders and symmetric positions are answered from the table. The position is restored before returning.
+    """
+    stats = search_profiler.collector
+    if position.is_terminal():
+        if stats is not None:
+            stats.terminal_hits += 1
+        return position.utility()
+    key = position.canonical_key()
+    if key in transposition_table:
+        if stats is not None:
+            stats.cache_hits += 1
+        return transposition_table[key]
+    search_stats['node_expansions'] += 1
+    if stats is not None:
+        stats.cache_misses += 1
+        stats.enter(position.num_moves)
+    maximize = position.player() == 'x'
+    utility = None
+    for move in position.legal_moves():
+        position.make(move)
+        child_utility = solve_position(position)
+        position.unmake(move)
+        if utility is None or (child_utility > utility if maximize else child_utility < utility):
+            utility = child_utility
+    transposition_table[key] = utility
+    if stats is not None:
+        stats.cache_stores += 1
+        stats.exit(position.num_moves)
+    return utility
+
+
+def best_action(position):
+    # First action (in square order) reaching the optimal utility, as the plain backward induction would pick it
+    key = position.key()
+    if key not in best_action_cache:
+        maximize = position.player() == 'x'
+        best_move = None
+        best_utility = None
+        for move in position.legal_moves():
+            position.make(move)
+            utility = solve_position(position)
+            position.unmake(move)
+            if best_utility is None or (utility > best_utility if maximize else utility < best_utility):
+                best_utility = utility
+                best_move = move
+        best_action_cache[key] = best_move
+    return best_action_cache[key]
+
+
+def write_strategies(position, history_str):
+    # Walk every history below a non-terminal position with make/unmake and store the best action of each, children
+    # first, in strategy_dict_x/strategy_dict_o
+    for move in position.legal_moves():
+        position.make(move)
+        if not position.is_terminal():
+            write_strategies(position, history_str + str(move))
+        position.unmake(move)
+
+    search_stats['histories'] += 1
+    default = {"0": 0, "1": 0, "2": 0, "3": 0, "4": 0, "5": 0, "6": 0, "7": 0, "8": 0}
+    default[str(best_action(position))] = 1
+    if position.player() == 'x':
+        strategy_dict_x[history_str] = default
+    else:
+        strategy_dict_o[history_str] = default
+
+
 def backward_induction(history_obj):
     """
     :param history_obj: Histroy class object
     :return: best achievable utility (float) for th current history_obj
     """
     global strategy_dict_x, strategy_dict_o
-    # TODO implement
     # (1) Implement backward induction for tictactoe
     # (2) Update the global variables strategy_dict_x or strategy_dict_o which are a mapping from histories to
     # probability distribution over actions.
@@ -173,51 +313,45 @@ def backward_induction(history_obj):
     # actions. But since tictactoe is a PIEFG, there always exists an optimal deterministic strategy (SPNE). So your
     # policy will be something like this {"0": 1, "1": 0, "2": 0, "3": 0, "4": 0, "5": 0, "6": 0, "7": 0, "8": 0} where
     # "0" was the one of the best actions for the current player/history.
-    
+    #
+    # Utilities come from solve_position, which expands each position only once. write_strategies still visits every
+    # history, because the strategy has to be keyed by the full history, but does so on one bitboard Position.
+
     if history_obj.is_terminal_history():
         return history_obj.get_utility_given_terminal_history()
-    
-    player = history_obj.player
-    history = history_obj
-    default = {"0": 0, "1": 0, "2": 0, "3": 0, "4": 0, "5": 0, "6": 0, "7": 0, "8": 0}
 
-    if player == 'x':
-        utility = -math.inf
-        best_move = None
-        for move in history_obj.get_valid_actions():
-            history = History(history_obj.update_history(move))
-            if backward_induction(history) > utility:
-                utility = backward_induction(history)
-                best_move = move
-        strategy_dict_x[history_obj.stringify()] = default
-        strategy_dict_x[history_obj.stringify()][str(best_move)] = 1
-        return utility
-    
-    if player == 'o':
-        utility = math.inf
-        best_move = None
-        for move in history_obj.get_valid_actions():
-            history = History(history_obj.update_history(move))
-            if backward_induction(history) < utility:
-                utility = backward_induction(history)
-                best_move = move
-        strategy_dict_o[history_obj.stringify()] = default
-        strategy_dict_o[history_obj.stringify()][str(best_move)] = 1
-        return utility
-        
-    # If the player is not 'x' or 'o', return -2 to indicate an error
-    return -2
+    position = Position.from_history(history_obj.history)
+    write_strategies(position, history_obj.stringify())
+    return solve_position(position)
 
 def solve_tictactoe():
+    search_stats['node_expansions'] = 0
+    search_stats['histories'] = 0
+    start = time.perf_counter()
     backward_induction(History())
+    elapsed = time.perf_counter() - start
+    logging.info("Solved in {:.2f}s: {} node expansions over {} cached positions, {} histories in the strategy".format(
+        elapsed, search_stats['node_expansions'], len(transposition_table), search_stats['histories']))
     with open('./policy_x.json', 'w') as f:
         json.dump(strategy_dict_x, f)
     with open('./policy_o.json', 'w') as f:
         json.dump(strategy_dict_o, f)
+    # Same strategies in the compact binary format read by play_tictactoe.py
+    write_policy('./policy_x.bin', strategy_dict_x)
+    write_policy('./policy_o.bin', strategy_dict_o)
     return strategy_dict_x, strategy_dict_o
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', type=str, nargs='?', const='-', default=None, metavar='PATH',
+                        help='write search statistics as JSON to PATH (stdout if no PATH is given)')
+    arguments = parser.parse_args()
+
     logging.info("Start")
+    if arguments.profile is not None:
+        search_profiler.enable()
     solve_tictactoe()
+    if arguments.profile is not None:
+        search_profiler.write_summaries({'backward_induction': search_profiler.disable()}, arguments.profile)
     logging.info("End")
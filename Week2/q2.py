@@ -1,16 +1,231 @@
-import copy  # use it for deepcopy if needed
+import argparse
 import math
 import logging
+import random
+import time
+
+import search_profiler
+from position_cache import DEFAULT_MAX_ENTRIES, PositionCache
+from trace_store import TraceView, TraceWriter
 
 logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
                     level=logging.INFO)
 
-# Global variable to keep track of visited board positions. This is a dictionary with keys as self.boards as str and
-# value represents the maxmin value. Use the get_boards_str function in History class to get the key corresponding to
-# self.boards.
+# Global variable to keep track of visited board positions. This is a dictionary with keys as the canonical key of
+# self.boards and value represents the maxmin value. Use the get_canonical_key function in History class to get the
+# key corresponding to self.boards.
 board_positions_val_dict = {}
 # Global variable to store the visited histories in the process of alpha beta pruning.
 visited_histories_list = []
+# Opt-in replacement of visited_histories_list: a trace_store.TraceWriter streaming the visited histories to a file
+# instead of keeping them all in memory (see solve_alpha_beta_pruning)
+trace_sink = None
+# tablebase.Tablebase answering History.lookup, set by --tablebase
+tablebase = None
+# position_cache.PositionCache that maxmin and alpha_beta_pruning read exact values through and write them back to,
+# kept across runs (set by --cache)
+position_cache = None
+
+# The 8 symmetries of a board (rotations and reflections) as permutations: square i of the transformed board is square
+# SYMMETRIES[k][i] of the original one (same as q1.SYMMETRIES)
+SYMMETRIES = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8],
+    [6, 3, 0, 7, 4, 1, 8, 5, 2],
+    [8, 7, 6, 5, 4, 3, 2, 1, 0],
+    [2, 5, 8, 1, 4, 7, 0, 3, 6],
+    [2, 1, 0, 5, 4, 3, 8, 7, 6],
+    [6, 7, 8, 3, 4, 5, 0, 1, 2],
+    [0, 3, 6, 1, 4, 7, 2, 5, 8],
+    [8, 5, 2, 7, 4, 1, 6, 3, 0],
+]
+# CANONICAL_BOARD[mask] is the smallest of the 8 symmetric variants of a board given as a 9-bit mask of its 'x' squares
+CANONICAL_BOARD = [
+    min(sum(1 << i for i in range(9) if mask >> symmetry[i] & 1) for symmetry in SYMMETRIES) for mask in range(512)
+]
+
+# Zobrist hashing of the canonical key (see History.get_canonical_key): every canonical live board has a random 64-bit
+# number, and the hash of a position is the sum (mod 2^64) of the numbers of its live boards, plus ZOBRIST_PLAYER_2
+# when player 2 is to move. A sum rather than the usual xor, so that two equal boards do not cancel out. A move
+# changes one board, so the hash is updated by subtracting the number of the board before the move and adding the
+# one after it (nothing for a board the move completes).
+HASH_MASK = (1 << 64) - 1
+_zobrist_random = random.Random(20)
+ZOBRIST_BOARD = [_zobrist_random.getrandbits(64) for _ in range(512)]
+ZOBRIST_PLAYER_2 = _zobrist_random.getrandbits(64)
+# IS_DEAD[mask] is True when the board given as a 9-bit mask has a complete line
+LINES = [0b000000111, 0b000111000, 0b111000000, 0b001001001, 0b010010010, 0b100100100, 0b100010001, 0b001010100]
+IS_DEAD = [any(mask & line == line for line in LINES) for mask in range(512)]
+
+# Transposition table entry flags
+EXACT = 0
+LOWER = 1  # the value is a lower bound (the search failed high)
+UPPER = 2  # the value is an upper bound (the search failed low)
+DEFAULT_TABLE_SIZE = 1 << 20
+
+
+class TranspositionTable:
+    """ Fixed-capacity hash table of alpha beta results. Each slot holds the full hash, the value, its bound flag, the
+    depth (moves left) of the search that produced it and the hash of the position after its best move, which
+    identifies that move whatever the symmetry or board order the position is met in again. Slots come in buckets of
+    two, chosen by the hash: the first slot keeps the deepest search seen (depth-preferred), the second always takes
+    the latest result that does not displace the first, so that shallow positions near the leaves, which are met again
+    most often, still get cached.
+    """
+
+    def __init__(self, capacity=DEFAULT_TABLE_SIZE):
+        self.capacity = capacity
+        self.clear()
+
+    def clear(self):
+        self.hashes = [None] * self.capacity
+        self.values = [0] * self.capacity
+        self.flags = [EXACT] * self.capacity
+        self.depths = [0] * self.capacity
+        self.best_hashes = [None] * self.capacity
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replaced = 0
+        # probes whose entry answered the search without expanding the position, counted by alpha_beta_pruning
+        self.cutoffs = 0
+
+    def probe(self, zobrist_hash):
+        # (value, flag, hash after the best move) stored for the hash, or None
+        self.probes += 1
+        if self.capacity < 2:
+            return None
+        slot = zobrist_hash % (self.capacity // 2) * 2
+        if self.hashes[slot] != zobrist_hash:
+            slot += 1
+            if self.hashes[slot] != zobrist_hash:
+                return None
+        self.hits += 1
+        return self.values[slot], self.flags[slot], self.best_hashes[slot]
+
+    def store(self, zobrist_hash, value, flag, depth, best_hash=None):
+        if self.capacity < 2:
+            return
+        slot = zobrist_hash % (self.capacity // 2) * 2
+        if self.hashes[slot + 1] == zobrist_hash:
+            slot += 1
+        elif self.hashes[slot] is not None and self.hashes[slot] != zobrist_hash:
+            if self.hashes[slot + 1] is not None:
+                self.replaced += 1
+            if self.depths[slot] > depth:
+                # the depth-preferred slot keeps its deeper entry
+                slot += 1
+            else:
+                # the entry it displaces moves to the always-replace slot
+                self._write(slot + 1, self.hashes[slot], self.values[slot], self.flags[slot], self.depths[slot],
+                            self.best_hashes[slot])
+        self.stores += 1
+        self._write(slot, zobrist_hash, value, flag, depth, best_hash)
+
+    def _write(self, slot, zobrist_hash, value, flag, depth, best_hash):
+        self.hashes[slot] = zobrist_hash
+        self.values[slot] = value
+        self.flags[slot] = flag
+        self.depths[slot] = depth
+        self.best_hashes[slot] = best_hash
+
+    def __len__(self):
+        return self.capacity - self.hashes.count(None)
+
+    def hit_rate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+
+# Global transposition table of alpha_beta_pruning
+transposition_table = TranspositionTable()
+
+# Static preference of squares: centre, then corners, then edges
+SQUARE_RANK = [1, 2, 1, 2, 0, 2, 1, 2, 1]
+
+
+class MoveOrdering:
+    """ Order in which alpha_beta_pruning tries the valid actions; the sooner a refutation is tried, the sooner the
+    search is cut off. Each heuristic can be switched on separately; enabled ones are applied in this order:
+
+    hint: the best move stored in the transposition table for the position goes first
+    safe: moves that do not complete a line (and so do not kill a board) before those that do
+    killers: the last two moves that caused a cutoff at the same depth
+    history: moves by how much cutoff work they have caused so far (sum of the squared moves left at each cutoff)
+    centre: centre, then corners, then edges
+
+    Moves equal under all enabled heuristics keep their index order.
+    """
+
+    def __init__(self, hint=False, safe=False, killers=False, history=False, centre=False):
+        self.hint = hint
+        self.safe = safe
+        self.killers = killers
+        self.history = history
+        self.centre = centre
+        self.clear()
+
+    def clear(self):
+        # forget the killer moves and history scores of previous searches
+        self.killer_moves = {}
+        self.history_scores = {}
+
+    def order(self, history_obj, actions, hint_hash=None):
+        """
+        :param history_obj: History class object
+        :param actions: valid actions of history_obj
+        :param hint_hash: hash after the best move stored in the transposition table, if any
+        :return: list, actions in the order to try them
+        """
+        if not (self.safe or self.killers or self.history or self.centre):
+            ordered = list(actions)
+        else:
+            masks = [history_obj.get_board_mask(i) for i in range(history_obj.num_boards)]
+            killers = self.killer_moves.get(len(history_obj.history), ()) if self.killers else ()
+            history_scores = self.history_scores if self.history else {}
+
+            def sort_key(action):
+                move_key = self.move_key(masks[action // 9], action)
+                return (self.safe and IS_DEAD[masks[action // 9] | 1 << (action % 9)],
+                        killers.index(move_key) if move_key in killers else len(killers),
+                        -history_scores.get(move_key, 0),
+                        SQUARE_RANK[action % 9] if self.centre else 0)
+            ordered = sorted(actions, key=sort_key)
+        if self.hint and hint_hash is not None:
+            for index, action in enumerate(ordered):
+                if history_obj.get_zobrist_hash_after(action) == hint_hash:
+                    ordered.insert(0, ordered.pop(index))
+                    break
+        return ordered
+
+    @staticmethod
+    def move_key(mask, action):
+        # Killer moves and history scores are kept per change of a board (canonical board before and after the move),
+        # not per action, so that they carry over to the same move on another board or in another orientation
+        return CANONICAL_BOARD[mask], CANONICAL_BOARD[mask | 1 << (action % 9)]
+
+    def cutoff(self, history_obj, action):
+        # action caused a beta cutoff at history_obj
+        move_key = self.move_key(history_obj.get_board_mask(action // 9), action)
+        if self.killers:
+            killers = self.killer_moves.setdefault(len(history_obj.history), [])
+            if move_key not in killers:
+                killers.insert(0, move_key)
+                del killers[2:]
+        if self.history:
+            moves_left = 9 * history_obj.num_boards - len(history_obj.history)
+            self.history_scores[move_key] = self.history_scores.get(move_key, 0) + moves_left * moves_left
+
+
+MOVE_ORDERINGS = {
+    'index': MoveOrdering(),
+    'centre': MoveOrdering(centre=True),
+    'safe': MoveOrdering(safe=True, centre=True),
+    'killers': MoveOrdering(killers=True, centre=True),
+    'history': MoveOrdering(history=True, centre=True),
+    'hint': MoveOrdering(hint=True, centre=True),
+    'all': MoveOrdering(hint=True, safe=True, killers=True, history=True, centre=True),
+}
+# Global move ordering of alpha_beta_pruning, the one visiting the fewest histories in move_ordering_benchmark
+move_ordering = MOVE_ORDERINGS['hint']
 
 
 class History:
@@ -69,6 +284,8 @@ class History:
         # Maintain a list to keep track of active boards
         self.active_board_stats = self.check_active_boards()
         self.current_player = self.get_current_player()
+        # Zobrist hash of the position, computed on demand by get_zobrist_hash unless the parent set it
+        self.zobrist_hash = None
 
     def get_boards(self):
         """ Play out the current self.history and get the boards corresponding to the history.
@@ -158,6 +375,65 @@ class History:
             boards_str = boards_str + ''.join([str(j) for j in self.boards[i]])
         return boards_str
 
+    def get_canonical_key(self):
+        """ Key shared by every position with the same maxmin value: dead boards are dropped (no move can be played on
+        them), each live board is replaced by its smallest symmetric variant, and the boards are sorted, since their
+        order does not matter. The parity of the number of moves played tells whose turn it is, which the live boards
+        alone no longer do.
+
+        :return: tuple (number of moves played % 2, sorted tuple of canonical 9-bit masks of the live boards)
+        """
+        live_boards = []
+        for i in range(self.num_boards):
+            if self.active_board_stats[i]:
+                live_boards.append(CANONICAL_BOARD[self.get_board_mask(i)])
+        return len(self.history) % 2, tuple(sorted(live_boards))
+
+    def get_board_mask(self, i):
+        # board i as a 9-bit mask of its 'x' squares
+        mask = 0
+        for j in range(9):
+            if self.boards[i][j] == 'x':
+                mask |= 1 << j
+        return mask
+
+    def get_zobrist_hash(self):
+        """ Zobrist hash of the canonical key, see ZOBRIST_BOARD. """
+        if self.zobrist_hash is None:
+            zobrist_hash = ZOBRIST_PLAYER_2 if self.current_player == 2 else 0
+            for i in range(self.num_boards):
+                if self.active_board_stats[i]:
+                    zobrist_hash += ZOBRIST_BOARD[CANONICAL_BOARD[self.get_board_mask(i)]]
+            self.zobrist_hash = zobrist_hash & HASH_MASK
+        return self.zobrist_hash
+
+    def get_zobrist_hash_after(self, action):
+        """ Zobrist hash of the position after playing action, updated from this one's.
+
+        :param action: valid action, an int between 0-(9n-1)
+        :return: int
+        """
+        mask = self.get_board_mask(action // 9)
+        new_mask = mask | 1 << (action % 9)
+        zobrist_hash = self.get_zobrist_hash() - ZOBRIST_BOARD[CANONICAL_BOARD[mask]]
+        if not IS_DEAD[new_mask]:
+            zobrist_hash += ZOBRIST_BOARD[CANONICAL_BOARD[new_mask]]
+        # the other player is to move
+        zobrist_hash += ZOBRIST_PLAYER_2 if self.current_player == 1 else -ZOBRIST_PLAYER_2
+        return zobrist_hash & HASH_MASK
+
+    def lookup(self, table=None):
+        """ Value and best move of the position, read from a tablebase.Tablebase instead of searched.
+
+        :param table: Tablebase, the global tablebase if None
+        :return: (value, action): value as maxmin computes it, action winning for the player to move if there is one,
+                 None if the game is over
+        """
+        table = table if table is not None else tablebase
+        if table is None:
+            raise ValueError('no tablebase is loaded')
+        return table.lookup([self.get_board_mask(i) for i in range(self.num_boards)], len(self.history))
+
     def is_win(self):
         # Feel free to implement this in anyway if needed
         finished = True
@@ -183,7 +459,9 @@ class History:
 
     def get_value_given_terminal_history(self):
         # Feel free to implement this in anyway if needed
-        return 1-2*len(self.history)%2
+        # The player who completed the last board loses: player 1 wins if an even number of moves was played.
+        # (1-2*len(self.history)%2 parses as 1-((2*len)%2) and was always 1.)
+        return 1 - 2 * (len(self.history) % 2)
 
 
 def alpha_beta_pruning(history_obj, alpha, beta, max_player_flag):
@@ -191,6 +469,10 @@ def alpha_beta_pruning(history_obj, alpha, beta, max_player_flag):
         Calculate the maxmin value given a History object using alpha beta pruning. Use the specific move order to
         speedup (more pruning, less memory).
 
+        Values found here are stored in transposition_table with the kind of bound they are, since a search cut off by
+        alpha or beta only bounds the true value; bounds narrow the window when the position is met again. Exact values
+        are also read from and written to position_cache, if one is set.
+
     :param history_obj: History class object
     :param alpha: -math.inf
     :param beta: math.inf
@@ -199,64 +481,117 @@ def alpha_beta_pruning(history_obj, alpha, beta, max_player_flag):
     """
 
     global visited_histories_list
-    global board_positions_val_dict
-    visited_histories_list.append(history_obj.history)
+    if trace_sink is not None:
+        trace_sink.append(history_obj.history)
+    else:
+        visited_histories_list.append(history_obj.history)
+    stats = search_profiler.collector
 
     if history_obj.is_win():
+        if stats is not None:
+            stats.terminal_hits += 1
         return history_obj.get_value_given_terminal_history()
-    
-    if board_positions_val_dict.get(history_obj.get_boards_str()):
-        return board_positions_val_dict.get(history_obj.get_boards_str())
 
-    if max_player_flag:
-        best_val = -math.inf
-        best_move = None
-        for i in history_obj.get_valid_actions():
-            new_history = copy.deepcopy(history_obj.history)
-            new_history.append(i)
-            value = alpha_beta_pruning(History(history=new_history), alpha, beta, not max_player_flag)
-            if value > best_val:
-                best_val = value
-                best_move = i
+    original_alpha, original_beta = alpha, beta
+    zobrist_hash = history_obj.get_zobrist_hash()
+    entry = transposition_table.probe(zobrist_hash)
+    hint_hash = None
+    if entry is not None:
+        if stats is not None:
+            stats.cache_hits += 1
+        value, flag, hint_hash = entry
+        if flag == LOWER:
+            alpha = max(alpha, value)
+        elif flag == UPPER:
+            beta = min(beta, value)
+        if flag == EXACT or beta <= alpha:
+            transposition_table.cutoffs += 1
+            return value
+    elif stats is not None:
+        stats.cache_misses += 1
+    if position_cache is not None:
+        value = position_cache.get(history_obj.get_canonical_key())
+        if value is not None:
+            if stats is not None:
+                stats.persistent_cache_hits += 1
+            transposition_table.store(zobrist_hash, value, EXACT, 9 * history_obj.num_boards - len(history_obj.history))
+            return value
+    if stats is not None:
+        stats.enter(len(history_obj.history))
+
+    best_val = -math.inf if max_player_flag else math.inf
+    best_hash = None
+    for move_index, i in enumerate(move_ordering.order(history_obj, history_obj.get_valid_actions(), hint_hash)):
+        child_history = History(history=history_obj.history + [i], num_boards=history_obj.num_boards)
+        child_history.zobrist_hash = history_obj.get_zobrist_hash_after(i)
+        value = alpha_beta_pruning(child_history, alpha, beta, not max_player_flag)
+        if value > best_val if max_player_flag else value < best_val:
+            best_val = value
+            best_hash = child_history.zobrist_hash
+        if max_player_flag:
             alpha = max(alpha, best_val)
-            if beta <= alpha:
-                break
-        board_positions_val_dict[History(history=new_history).get_boards_str()]=best_val
-        return best_val
-    
-    if not max_player_flag:
-        best_val = math.inf
-        best_move = None
-        for i in history_obj.get_valid_actions():
-            new_history = copy.deepcopy(history_obj.history)
-            new_history.append(i)
-            value = alpha_beta_pruning(History(history=new_history), alpha, beta, not max_player_flag)
-            if value < best_val:
-                best_val = value
-                best_move = i
+        else:
             beta = min(beta, best_val)
-            if beta <= alpha:
-                break
-        board_positions_val_dict[History(history=new_history).get_boards_str()]=best_val
-        return best_val
+        if beta <= alpha:
+            move_ordering.cutoff(history_obj, i)
+            if stats is not None:
+                stats.cutoff(move_index)
+            break
+
+    if best_val <= original_alpha:
+        flag = UPPER
+    elif best_val >= original_beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    # Notakto has no draws, so a bound at the end of the range of values (-1, 1) is the exact value
+    if (flag == LOWER and best_val >= 1) or (flag == UPPER and best_val <= -1):
+        flag = EXACT
+    # Moves left on the boards is the size of the subtree the entry saves, which the replacement policy prefers
+    transposition_table.store(zobrist_hash, best_val, flag, 9 * history_obj.num_boards - len(history_obj.history),
+                              best_hash)
+    if position_cache is not None and flag == EXACT:
+        position_cache.put(history_obj.get_canonical_key(), best_val)
+    if stats is not None:
+        stats.cache_stores += 1
+        stats.exit(len(history_obj.history))
+    return best_val
 
 
 def maxmin(history_obj, max_player_flag):
     """
         Calculate the maxmin value given a History object using maxmin rule. Store the value of already visited
         board positions to speed up, avoiding recursive calls for a different history with the same board position.
+        Values missing from board_positions_val_dict are read from position_cache, and written back to it, if one is
+        set.
     :param history_obj: History class object
     :param max_player_flag: True if the player is maximizing player
     :return: float
     """
     global board_positions_val_dict
+    stats = search_profiler.collector
     
     if history_obj.is_win():
+        if stats is not None:
+            stats.terminal_hits += 1
         return history_obj.get_value_given_terminal_history()
     
-    board_str = history_obj.get_boards_str()
-    if board_str in board_positions_val_dict:
-        return board_positions_val_dict[board_str]
+    key = history_obj.get_canonical_key()
+    if key in board_positions_val_dict:
+        if stats is not None:
+            stats.cache_hits += 1
+        return board_positions_val_dict[key]
+    if stats is not None:
+        stats.cache_misses += 1
+    if position_cache is not None:
+        value = position_cache.get(key)
+        if value is not None:
+            if stats is not None:
+                stats.persistent_cache_hits += 1
+            board_positions_val_dict[key] = value
+            return value
+    if stats is not None:
+        stats.enter(len(history_obj.history))
     
     if max_player_flag:
         best_val = -math.inf
@@ -268,7 +603,12 @@ def maxmin(history_obj, max_player_flag):
             value = maxmin(child_history, False)
             best_val = max(best_val, value)
         
-        board_positions_val_dict[board_str] = best_val
+        board_positions_val_dict[key] = best_val
+        if position_cache is not None:
+            position_cache.put(key, best_val)
+        if stats is not None:
+            stats.cache_stores += 1
+            stats.exit(len(history_obj.history))
         return best_val
     
     else:  
@@ -281,23 +621,185 @@ def maxmin(history_obj, max_player_flag):
             value = maxmin(child_history, True)
             best_val = min(best_val, value)
         
-        board_positions_val_dict[board_str] = best_val
+        board_positions_val_dict[key] = best_val
+        if position_cache is not None:
+            position_cache.put(key, best_val)
+        if stats is not None:
+            stats.cache_stores += 1
+            stats.exit(len(history_obj.history))
         return best_val
 
 
 
-def solve_alpha_beta_pruning(history_obj, alpha, beta, max_player_flag):
-    global visited_histories_list
+def solve_alpha_beta_pruning(history_obj, alpha, beta, max_player_flag, trace_path=None):
+    """
+    :param trace_path: if given, stream the visited histories to this trace file rather than visited_histories_list
+    :return: (value, visited histories), the histories as visited_histories_list or, with trace_path, as a lazy
+             trace_store.TraceView of the file
+    """
+    global visited_histories_list, trace_sink
+    if trace_path is not None:
+        trace_sink = TraceWriter(trace_path)
+        try:
+            val = alpha_beta_pruning(history_obj, alpha, beta, max_player_flag)
+        finally:
+            trace_sink.close()
+            count, trace_sink = trace_sink.count, None
+        return val, TraceView(trace_path, count)
     val = alpha_beta_pruning(history_obj, alpha, beta, max_player_flag)
     return val, visited_histories_list
 
 
+def cache_size_table(board_counts):
+    """ Solve the empty game for each number of boards with maxmin and with alpha beta pruning, each starting from an
+    empty cache, and log the value, the number of cached positions and the time of both, with the transposition table
+    statistics of alpha beta pruning. Pruning gain is the number of positions maxmin expands (every canonical position)
+    over the number alpha beta pruning expands.
+
+    :param board_counts: list of int, numbers of boards
+    :return: list of dicts, one per number of boards
+    """
+    global visited_histories_list
+    rows = []
+    for num_boards in board_counts:
+        row = {'num_boards': num_boards}
+        board_positions_val_dict.clear()
+        start = time.perf_counter()
+        row['value'] = maxmin(History(history=[], num_boards=num_boards), True)
+        row['maxmin_seconds'] = time.perf_counter() - start
+        row['maxmin_entries'] = len(board_positions_val_dict)
+        board_positions_val_dict.clear()
+        transposition_table.clear()
+        move_ordering.clear()
+        visited_histories_list = []
+        start = time.perf_counter()
+        alpha_beta_pruning(History(history=[], num_boards=num_boards), -math.inf, math.inf, True)
+        row['alpha_beta_seconds'] = time.perf_counter() - start
+        row['alpha_beta_expanded'] = transposition_table.stores
+        row['alpha_beta_histories'] = len(visited_histories_list)
+        row['table_entries'] = len(transposition_table)
+        row['hit_rate'] = transposition_table.hit_rate()
+        row['table_cutoffs'] = transposition_table.cutoffs
+        row['pruning_gain'] = row['maxmin_entries'] / row['alpha_beta_expanded']
+        rows.append(row)
+    board_positions_val_dict.clear()
+    transposition_table.clear()
+    visited_histories_list = []
+
+    logging.info("{:>6} {:>6} {:>14} {:>9} {:>12} {:>11} {:>9} {:>9} {:>9} {:>8} {:>8}".format(
+        'boards', 'value', 'maxmin entries', 'maxmin s', 'ab expanded', 'ab visited', 'tt size', 'hit rate',
+        'tt cuts', 'gain', 'ab s'))
+    for row in rows:
+        logging.info("{num_boards:>6} {value:>6} {maxmin_entries:>14} {maxmin_seconds:>9.2f} {alpha_beta_expanded:>12} "
+                     "{alpha_beta_histories:>11} {table_entries:>9} {hit_rate:>9.1%} {table_cutoffs:>9} "
+                     "{pruning_gain:>7.1f}x {alpha_beta_seconds:>8.2f}".format(**row))
+    return rows
+
+
+def move_ordering_benchmark(board_counts):
+    """ Solve the empty game for each number of boards with alpha beta pruning under every strategy in
+    MOVE_ORDERINGS, each starting from an empty transposition table, and log the number of visited histories, the
+    positions expanded and the time of each.
+
+    :param board_counts: list of int, numbers of boards
+    :return: list of dicts, one per number of boards and strategy
+    """
+    global visited_histories_list, move_ordering
+    default_ordering = move_ordering
+    rows = []
+    for num_boards in board_counts:
+        for name, ordering in MOVE_ORDERINGS.items():
+            move_ordering = ordering
+            move_ordering.clear()
+            transposition_table.clear()
+            visited_histories_list = []
+            start = time.perf_counter()
+            value = alpha_beta_pruning(History(history=[], num_boards=num_boards), -math.inf, math.inf, True)
+            rows.append({'num_boards': num_boards, 'ordering': name, 'value': value,
+                         'seconds': time.perf_counter() - start, 'histories': len(visited_histories_list),
+                         'expanded': transposition_table.stores})
+    move_ordering = default_ordering
+    move_ordering.clear()
+    transposition_table.clear()
+    visited_histories_list = []
+
+    logging.info("{:>6} {:>8} {:>6} {:>10} {:>10} {:>9}".format(
+        'boards', 'ordering', 'value', 'visited', 'expanded', 'seconds'))
+    for row in rows:
+        logging.info("{num_boards:>6} {ordering:>8} {value:>6} {histories:>10} {expanded:>10} {seconds:>9.3f}".format(
+            **row))
+    return rows
+
+
 if __name__ == "__main__":
-    logging.info("start")
-    logging.info("alpha beta pruning")
-    value, visited_histories = solve_alpha_beta_pruning(History(history=[], num_boards=2), -math.inf, math.inf, True)
-    logging.info("maxmin value {}".format(value))
-    logging.info("Number of histories visited {}".format(len(visited_histories)))
-    logging.info("maxmin memory")
-    logging.info("maxmin value {}".format(maxmin(History(history=[], num_boards=2), True)))
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profile', type=str, nargs='?', const='-', default=None, metavar='PATH',
+                        help='write search statistics as JSON to PATH (stdout if no PATH is given)')
+    parser.add_argument('--num-boards', type=int, default=2)
+    parser.add_argument('--table-size', type=int, default=DEFAULT_TABLE_SIZE,
+                        help='entries of the alpha beta transposition table')
+    parser.add_argument('--move-ordering', type=str, default='hint', choices=list(MOVE_ORDERINGS),
+                        help='move ordering of alpha beta pruning')
+    parser.add_argument('--ordering-benchmark', type=int, nargs='*', default=None, metavar='NUM_BOARDS',
+                        help='only compare the move orderings for these numbers of boards (default 1 2 3)')
+    parser.add_argument('--trace', type=str, default=None, metavar='PATH',
+                        help='stream the histories visited by alpha beta pruning to a trace file at PATH')
+    parser.add_argument('--cache-table', type=int, nargs='*', default=None, metavar='NUM_BOARDS',
+                        help='only log the cache sizes of both searches for these numbers of boards (default 1 2 3 4)')
+    parser.add_argument('--tablebase', type=str, default=None, metavar='PATH',
+                        help='only look up the value and best move in the tablebase at PATH (see tablebase.py)')
+    parser.add_argument('--cache', type=str, default=None, metavar='PATH',
+                        help='read and write back exact values through the SQLite position cache at PATH, kept across '
+                             'runs')
+    parser.add_argument('--cache-entries', type=int, default=DEFAULT_MAX_ENTRIES,
+                        help='most positions kept in the --cache file, the least recently used are evicted')
+    arguments = parser.parse_args()
+    profile = {}
+    transposition_table = TranspositionTable(arguments.table_size)
+    move_ordering = MOVE_ORDERINGS[arguments.move_ordering]
+
+    if arguments.cache_table is not None:
+        cache_size_table(arguments.cache_table or [1, 2, 3, 4])
+        raise SystemExit()
+    if arguments.ordering_benchmark is not None:
+        move_ordering_benchmark(arguments.ordering_benchmark or [1, 2, 3])
+        raise SystemExit()
+    if arguments.tablebase is not None:
+        from tablebase import Tablebase
+        tablebase = Tablebase.load(arguments.tablebase)
+        logging.info("tablebase value {}, best move {}".format(
+            *History(history=[], num_boards=arguments.num_boards).lookup()))
+        raise SystemExit()
+
+    if arguments.cache is not None:
+        position_cache = PositionCache(arguments.cache, arguments.num_boards, arguments.cache_entries)
+        logging.info("position cache {}: {} positions".format(arguments.cache, len(position_cache)))
+
+    try:
+        logging.info("start")
+        logging.info("alpha beta pruning")
+        if arguments.profile is not None:
+            search_profiler.enable()
+        start = time.perf_counter()
+        value, visited_histories = solve_alpha_beta_pruning(History(history=[], num_boards=arguments.num_boards),
+                                                            -math.inf, math.inf, True, arguments.trace)
+        if arguments.profile is not None:
+            profile['alpha_beta_pruning'] = search_profiler.disable()
+        logging.info("maxmin value {}".format(value))
+        logging.info("Number of histories visited {} in {:.3f}s".format(len(visited_histories),
+                                                                       time.perf_counter() - start))
+        logging.info("maxmin memory")
+        if arguments.profile is not None:
+            search_profiler.enable()
+        start = time.perf_counter()
+        value = maxmin(History(history=[], num_boards=arguments.num_boards), True)
+        logging.info("maxmin value {} in {:.3f}s".format(value, time.perf_counter() - start))
+        if arguments.profile is not None:
+            profile['maxmin'] = search_profiler.disable()
+            search_profiler.write_summaries(profile, arguments.profile)
+    finally:
+        if position_cache is not None:
+            position_cache.close()
+            logging.info("position cache: {} hits, {} misses, {} positions, {} evicted".format(
+                position_cache.hits, position_cache.misses, len(position_cache), position_cache.evicted))
     logging.info("end")
@@ -0,0 +1,99 @@
+import json
+import sys
+import time
+
+# Active SearchStats, or None while profiling is off. The solvers check it once per node
+# (`if search_profiler.collector is not None`), so a disabled profiler costs one attribute lookup per node.
+collector = None
+
+
+class SearchStats:
+    """ Counters of one search: nodes expanded and time spent per depth, terminal histories reached, cache
+    hits/misses/stores, and beta cutoffs per index of the move that caused them (0 = first move tried).
+
+    Cache hits and misses are those of the in-memory cache of the search; persistent cache hits are the misses that the
+    on-disk q2.position_cache answered.
+
+    Depth is the number of moves played since the start of the game. Time per depth is the time spent in nodes of that
+    depth excluding their children, so it adds up to the time of the whole search.
+    """
+
+    def __init__(self):
+        self.nodes_per_depth = {}
+        self.time_per_depth = {}
+        self.terminal_hits = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_stores = 0
+        self.persistent_cache_hits = 0
+        self.cutoffs_per_move_index = {}
+        # [start time, time spent in children] of the nodes being expanded
+        self._open_nodes = []
+        self._start = time.perf_counter()
+
+    def enter(self, depth):
+        # a node at depth is expanded
+        self.nodes_per_depth[depth] = self.nodes_per_depth.get(depth, 0) + 1
+        self._open_nodes.append([time.perf_counter(), 0.0])
+
+    def exit(self, depth):
+        # the node entered last is done
+        start, children = self._open_nodes.pop()
+        elapsed = time.perf_counter() - start
+        self.time_per_depth[depth] = self.time_per_depth.get(depth, 0.0) + elapsed - children
+        if self._open_nodes:
+            self._open_nodes[-1][1] += elapsed
+
+    def cutoff(self, move_index):
+        self.cutoffs_per_move_index[move_index] = self.cutoffs_per_move_index.get(move_index, 0) + 1
+
+    def summary(self):
+        """ JSON-serializable dict of the counters. Per-depth and per-move-index counters are lists indexed by depth and
+        move index.
+        """
+        def as_list(counts, zero):
+            return [counts.get(i, zero) for i in range(max(counts) + 1)] if counts else []
+
+        cutoffs = sum(self.cutoffs_per_move_index.values())
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            'seconds': time.perf_counter() - self._start,
+            'search_seconds': sum(self.time_per_depth.values()),
+            'nodes_expanded': sum(self.nodes_per_depth.values()),
+            'nodes_per_depth': as_list(self.nodes_per_depth, 0),
+            'time_per_depth': as_list(self.time_per_depth, 0.0),
+            'terminal_hits': self.terminal_hits,
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_stores': self.cache_stores,
+            'cache_hit_rate': self.cache_hits / lookups if lookups else 0.0,
+            'persistent_cache_hits': self.persistent_cache_hits,
+            'combined_cache_hit_rate': (self.cache_hits + self.persistent_cache_hits) / lookups if lookups else 0.0,
+            'beta_cutoffs': cutoffs,
+            'cutoffs_per_move_index': as_list(self.cutoffs_per_move_index, 0),
+            'first_move_cutoff_rate': self.cutoffs_per_move_index.get(0, 0) / cutoffs if cutoffs else 0.0,
+        }
+
+
+def enable():
+    # Start collecting into a new SearchStats and return it
+    global collector
+    collector = SearchStats()
+    return collector
+
+
+def disable():
+    # Stop collecting and return the summary of what was collected (None if profiling was off)
+    global collector
+    stats, collector = collector, None
+    return stats.summary() if stats is not None else None
+
+
+def write_summaries(summaries, path='-'):
+    """ Write {search name: summary} as JSON to path, '-' for stdout. """
+    if path == '-':
+        json.dump(summaries, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(path, 'w') as f:
+            json.dump(summaries, f, indent=2)
@@ -0,0 +1,217 @@
+import argparse
+import itertools
+import logging
+import math
+import os
+import time
+
+import q2
+from q2 import CANONICAL_BOARD, IS_DEAD, History
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logging.basicConfig(format='%(levelname)s - %(asctime)s - %(message)s', datefmt='%d-%b-%y %H:%M:%S',
+                    level=logging.INFO)
+
+# A Notakto position is won or lost for the player to move according to the multiset of its live boards alone: dead
+# boards take no moves and the order of the boards does not matter. The tablebase stores one bit per multiset of at
+# most max_boards canonical live boards, set when the player to move wins.
+#
+# Live boards are numbered 0-45 by their canonical mask (LIVE_BOARDS), a multiset is the sorted tuple of their numbers,
+# and its index in the table is the combinadic rank of that tuple among the multisets of the same size, offset by the
+# number of smaller multisets: a perfect hash onto 0 .. table size - 1.
+MAGIC = b'NTKTB1\0\0'
+LIVE_BOARDS = sorted({CANONICAL_BOARD[mask] for mask in range(512) if not IS_DEAD[mask]})
+LIVE_INDEX = {mask: index for index, mask in enumerate(LIVE_BOARDS)}
+# STONES[i]: number of 'x' on live board i
+STONES = [bin(mask).count('1') for mask in LIVE_BOARDS]
+# SUCCESSORS[i]: distinct boards live board i can become in one move, as live board numbers, None for a dead board
+SUCCESSORS = [sorted({LIVE_INDEX.get(CANONICAL_BOARD[mask | 1 << square]) for square in range(9)
+                      if not mask >> square & 1}, key=lambda successor: -1 if successor is None else successor)
+              for mask in LIVE_BOARDS]
+
+
+def binomial_table(n, k):
+    # BINOMIAL[i][j] = C(i, j) for i < n, j <= k
+    return [[math.comb(i, j) for j in range(k + 1)] for i in range(n)]
+
+
+def table_size(num_boards):
+    # number of multisets of at most num_boards live boards
+    return sum(math.comb(len(LIVE_BOARDS) + size - 1, size) for size in range(num_boards + 1))
+
+
+class Tablebase:
+    """ Win/loss bit of every Notakto position of at most max_boards live boards, packed 8 per byte in a numpy uint8
+    array (a bytearray if numpy is not installed). Built by build(), saved and loaded as MAGIC, max_boards (one byte)
+    and the packed bits.
+    """
+
+    def __init__(self, max_boards, bits):
+        self.max_boards = max_boards
+        self.bits = np.frombuffer(bytes(bits), dtype=np.uint8) if np is not None else bytearray(bits)
+        self.binomial = binomial_table(len(LIVE_BOARDS) + max_boards, max_boards)
+        # OFFSET[size]: index of the first multiset of that size
+        self.offset = [table_size(size - 1) if size else 0 for size in range(max_boards + 1)]
+
+    @staticmethod
+    def rank(boards, binomial, offset):
+        # index of the sorted tuple of live board numbers boards
+        index = offset[len(boards)]
+        for j, board in enumerate(boards):
+            index += binomial[board + j][j + 1]
+        return index
+
+    @classmethod
+    def build(cls, max_boards, layer_times=None):
+        """ Solve every multiset of at most max_boards live boards backwards from the terminal position (no live
+        board, won for the player to move since the opponent completed the last board). A move adds a stone: it either
+        kills a board, giving a smaller multiset, or replaces one with a board of one more stone. So multisets are
+        solved by increasing size and, within a size, in layers of decreasing stone count, and every successor of a
+        position is solved before it. A position is won when one of its successors is lost.
+
+        :param max_boards: largest number of live boards
+        :param layer_times: optional list, receives (size, seconds since the start) after each size
+        :return: Tablebase
+        """
+        start = time.perf_counter()
+        binomial = binomial_table(len(LIVE_BOARDS) + max_boards, max_boards)
+        offset = [table_size(size - 1) if size else 0 for size in range(max_boards + 1)]
+        rank = cls.rank
+        bits = bytearray((table_size(max_boards) + 7) // 8)
+        bits[0] = 1  # the terminal position
+        for size in range(1, max_boards + 1):
+            layers = {}
+            for boards in itertools.combinations_with_replacement(range(len(LIVE_BOARDS)), size):
+                layers.setdefault(sum(STONES[board] for board in boards), []).append(boards)
+            for stones in sorted(layers, reverse=True):
+                for boards in layers[stones]:
+                    won = False
+                    for j, board in enumerate(boards):
+                        if j and board == boards[j - 1]:
+                            continue
+                        rest = boards[:j] + boards[j + 1:]
+                        for successor in SUCCESSORS[board]:
+                            if successor is None:
+                                index = rank(rest, binomial, offset)
+                            else:
+                                index = rank(tuple(sorted(rest + (successor,))), binomial, offset)
+                            if not bits[index >> 3] >> (index & 7) & 1:
+                                won = True
+                                break
+                        if won:
+                            break
+                    if won:
+                        index = rank(boards, binomial, offset)
+                        bits[index >> 3] |= 1 << (index & 7)
+            if layer_times is not None:
+                layer_times.append((size, time.perf_counter() - start))
+        return cls(max_boards, bits)
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(bytes([self.max_boards]))
+            f.write(bytes(self.bits))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError('{} is not a Notakto tablebase'.format(path))
+            max_boards = f.read(1)[0]
+            bits = f.read()
+        if len(bits) != (table_size(max_boards) + 7) // 8:
+            raise ValueError('{} is truncated'.format(path))
+        return cls(max_boards, bits)
+
+    def nbytes(self):
+        return len(self.bits)
+
+    def mover_wins(self, masks):
+        """ True if the player to move wins the position made of the given boards.
+
+        :param masks: 9-bit masks of the 'x' squares of the boards, dead ones included
+        """
+        boards = sorted(LIVE_INDEX[CANONICAL_BOARD[mask]] for mask in masks if not IS_DEAD[mask])
+        if len(boards) > self.max_boards:
+            raise ValueError('the tablebase covers at most {} live boards, not {}'.format(self.max_boards, len(boards)))
+        index = self.rank(boards, self.binomial, self.offset)
+        return bool(self.bits[index >> 3] >> (index & 7) & 1)
+
+    def lookup(self, masks, num_moves):
+        """ Value and best move of a position.
+
+        :param masks: 9-bit masks of the 'x' squares of the boards, dead ones included
+        :param num_moves: number of moves played, which tells whose turn it is
+        :return: (value, action): value as q2.maxmin computes it, 1 if player 1 wins, -1 if player 2 wins; action (as
+                 in q2.History.history) winning for the player to move, else their first valid action, None if the
+                 game is over
+        """
+        mover_wins = self.mover_wins(masks)
+        value = 1 if mover_wins == (num_moves % 2 == 0) else -1
+        best_action = None
+        for board, mask in enumerate(masks):
+            if IS_DEAD[mask]:
+                continue
+            for square in range(9):
+                if mask >> square & 1:
+                    continue
+                action = 9 * board + square
+                if best_action is None:
+                    best_action = action
+                if not mover_wins:
+                    return value, best_action
+                masks_after = list(masks)
+                masks_after[board] = mask | 1 << square
+                if not self.mover_wins(masks_after):
+                    return value, action
+        return value, best_action
+
+
+def cross_validate(table, num_boards):
+    """ Compare the tablebase with q2.maxmin on every canonical position of the game of num_boards boards.
+
+    :return: (number of positions compared, number of disagreements)
+    """
+    q2.board_positions_val_dict.clear()
+    q2.maxmin(History(history=[], num_boards=num_boards), True)
+    mismatches = 0
+    for (parity, live_boards), maxmin_value in q2.board_positions_val_dict.items():
+        if table.lookup(list(live_boards), parity)[0] != maxmin_value:
+            mismatches += 1
+    compared = len(q2.board_positions_val_dict)
+    q2.board_positions_val_dict.clear()
+    return compared, mismatches
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--max-boards', type=int, default=4, help='largest number of live boards to solve')
+    parser.add_argument('--output', type=str, default=None, metavar='PATH', help='save the tablebase to PATH')
+    parser.add_argument('--cross-validate', type=int, nargs='*', default=[1, 2, 3], metavar='NUM_BOARDS',
+                        help='numbers of boards to check against q2.maxmin')
+    arguments = parser.parse_args()
+
+    layer_times = []
+    table = Tablebase.build(arguments.max_boards, layer_times)
+    logging.info("{:>6} {:>10} {:>10} {:>9}".format('boards', 'positions', 'bytes', 'seconds'))
+    for size, seconds in layer_times:
+        logging.info("{:>6} {:>10} {:>10} {:>9.2f}".format(size, table_size(size), (table_size(size) + 7) // 8,
+                                                           seconds))
+    if arguments.output is not None:
+        table.save(arguments.output)
+        logging.info("saved to {} ({} bytes)".format(arguments.output, os.path.getsize(arguments.output)))
+    for num_boards in arguments.cross_validate:
+        if num_boards <= table.max_boards:
+            compared, mismatches = cross_validate(table, num_boards)
+            logging.info("{} boards: {} positions compared with maxmin, {} disagreements".format(
+                num_boards, compared, mismatches))
+    for num_boards in range(1, table.max_boards + 1):
+        start = time.perf_counter()
+        value, action = History(history=[], num_boards=num_boards).lookup(table)
+        logging.info("{} boards: value {}, best move {}, lookup {:.1f} us".format(
+            num_boards, value, action, 1e6 * (time.perf_counter() - start)))
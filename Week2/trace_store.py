@@ -0,0 +1,184 @@
+import argparse
+import zlib
+from collections.abc import Sequence
+
+# Trace file layout: MAGIC, then a zlib stream of one record per visited history, in visiting order. Each history is
+# delta-encoded against the previous one: a record is the length of the prefix the two share, the number of actions
+# that follow it and those actions, each an unsigned LEB128 varint (one byte below 128, so any number of boards fits).
+# A depth-first search visits a history right after its parent or a sibling, so most records are three bytes before
+# compression.
+MAGIC = b'TRACE2\0\0'
+DEFAULT_BUFFER_SIZE = 1 << 16
+READ_SIZE = 1 << 16
+
+
+def _append_varint(buffer, value):
+    while value >= 0x80:
+        buffer.append(value & 0x7F | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varint(data, position):
+    # (value, position after it) of the varint at data[position], None if data ends inside it
+    value = shift = 0
+    while position < len(data):
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+    return None
+
+
+def _read_record(data, position):
+    # (length of the shared prefix, actions, position after the record), None if data ends inside the record
+    fields = []
+    count = None
+    while count is None or len(fields) < count + 2:
+        field = _read_varint(data, position)
+        if field is None:
+            return None
+        value, position = field
+        fields.append(value)
+        if len(fields) == 2:
+            count = value
+    return fields[0], fields[2:], position
+
+
+class TraceWriter:
+    """ Streams visited histories (lists of non-negative int actions) to a trace file. Encoded records are buffered up to
+    buffer_size bytes before being compressed and written, so memory stays bounded whatever the number of histories.
+    """
+
+    def __init__(self, path, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._compressor = zlib.compressobj()
+        self._buffer = bytearray()
+        self._previous = []
+
+    def append(self, history):
+        previous = self._previous
+        # fast paths for a child and a sibling of the previous history
+        if len(history) == len(previous) + 1 and history[:-1] == previous:
+            keep = len(previous)
+        elif len(history) == len(previous) and history[:-1] == previous[:-1]:
+            keep = len(history) - 1 if history[-1:] != previous[-1:] else len(history)
+        else:
+            keep = 0
+            limit = min(len(previous), len(history))
+            while keep < limit and previous[keep] == history[keep]:
+                keep += 1
+        suffix = history[keep:]
+        if keep < 0x80 and len(suffix) < 0x80 and all(action < 0x80 for action in suffix):
+            # every varint is one byte
+            self._buffer.append(keep)
+            self._buffer.append(len(suffix))
+            self._buffer.extend(suffix)
+        else:
+            _append_varint(self._buffer, keep)
+            _append_varint(self._buffer, len(suffix))
+            for action in suffix:
+                _append_varint(self._buffer, action)
+        self._previous = list(history)
+        self.count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self._file.write(self._compressor.compress(self._buffer))
+            self._buffer.clear()
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.write(self._compressor.compress(self._buffer))
+        self._file.write(self._compressor.flush())
+        self._buffer.clear()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def iter_trace(path):
+    """ Lazily yield the histories (lists of int) of a trace file, decompressing READ_SIZE bytes at a time. """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a trace file'.format(path))
+        decompressor = zlib.decompressobj()
+        pending = b''
+        history = []
+        while True:
+            chunk = f.read(READ_SIZE)
+            pending += decompressor.decompress(chunk) if chunk else decompressor.flush()
+            position = 0
+            # decode every complete record in pending, keep the rest for the next chunk
+            while True:
+                record = _read_record(pending, position)
+                if record is None:
+                    break
+                keep, actions, position = record
+                history = history[:keep] + actions
+                yield history
+            pending = pending[position:]
+            if not chunk:
+                break
+        if pending:
+            raise ValueError('{} ends in the middle of a record'.format(path))
+
+
+class TraceView(Sequence):
+    """ Read-only sequence of the histories of a trace file, read lazily: iteration streams the file, indexing scans it
+    (forward from the last index read when indices increase, so sequential indexing reads the file once).
+    """
+
+    def __init__(self, path, length=None):
+        self.path = path
+        self._length = length
+        self._iterator = None
+        self._index = -1
+        self._history = None
+
+    def __len__(self):
+        if self._length is None:
+            self._length = sum(1 for _ in iter_trace(self.path))
+        return self._length
+
+    def __iter__(self):
+        return iter_trace(self.path)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or (self._length is not None and index >= self._length):
+            raise IndexError('trace index out of range')
+        if self._iterator is None or index < self._index:
+            self._iterator = iter_trace(self.path)
+            self._index = -1
+        while self._index < index:
+            try:
+                self._history = next(self._iterator)
+            except StopIteration:
+                self._iterator = None
+                raise IndexError('trace index out of range')
+            self._index += 1
+        return list(self._history)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Print the histories of a trace file, one per line')
+    parser.add_argument('trace', type=str)
+    parser.add_argument('--limit', type=int, default=None, help='print at most this many histories')
+    arguments = parser.parse_args()
+    for i, history in enumerate(iter_trace(arguments.trace)):
+        if arguments.limit is not None and i >= arguments.limit:
+            break
+        print(' '.join(map(str, history)))